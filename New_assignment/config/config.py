@@ -18,6 +18,16 @@ DB_CONFIG = {
     'database': os.getenv('DB_DATABASE')
 }
 
+# Read-replica routing configurations
+# DB_REPLICA_HOSTS is a comma-separated list of replica hosts that share the
+# primary's credentials and database name.
+REPLICA_CONFIG = {
+    'hosts': [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()],
+    'strategy': os.getenv('DB_REPLICA_STRATEGY', 'round_robin'),
+    'max_lag_seconds': int(os.getenv('DB_REPLICA_MAX_LAG', 300)),
+    'lag_check_ttl': int(os.getenv('DB_REPLICA_LAG_TTL', 30))
+}
+
 # Application configurations
 APP_CONFIG = {
     'debug': os.getenv('DEBUG', 'False') == 'True',
@@ -25,6 +35,17 @@ APP_CONFIG = {
     'log_level': os.getenv('LOG_LEVEL', 'INFO')
 }
 
+# Query API service configurations
+# When QUERY_API_URL is set the dashboard queries the service instead of the database.
+API_CONFIG = {
+    'host': os.getenv('API_HOST', '127.0.0.1'),
+    'port': int(os.getenv('API_PORT', 8600)),
+    'url': os.getenv('QUERY_API_URL', ''),
+    'max_concurrent_queries': int(os.getenv('API_MAX_CONCURRENT_QUERIES', 8)),
+    'max_pending_requests': int(os.getenv('API_MAX_PENDING_REQUESTS', 256)),
+    'timeout': int(os.getenv('API_TIMEOUT', 60))
+}
+
 # Machine Learning configurations
 ML_CONFIG = {
     'min_training_samples': 50,
@@ -32,13 +53,32 @@ ML_CONFIG = {
     'random_state': 42
 }
 
+# Per-session filtered data cache configurations
+FILTER_CACHE_CONFIG = {
+    'ttl': int(os.getenv('FILTER_CACHE_TTL', 300)),
+    'max_rows': int(os.getenv('FILTER_CACHE_MAX_ROWS', 2000000))
+}
+
+# Export configurations
+EXPORT_CONFIG = {
+    'chunksize': int(os.getenv('EXPORT_CHUNKSIZE', 50000))
+}
+
+# Batch scoring configurations
+SCORING_CONFIG = {
+    'chunksize': int(os.getenv('SCORING_CHUNKSIZE', 50000))
+}
+
 # Path configurations
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 RAW_DATA_DIR = os.path.join(DATA_DIR, 'raw')
 PROCESSED_DATA_DIR = os.path.join(DATA_DIR, 'processed')
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
+EXPORT_DIR = os.path.join(DATA_DIR, 'exports')
+MODEL_DIR = os.path.join(DATA_DIR, 'models')
+MODEL_PATH = os.getenv('MODEL_PATH', os.path.join(MODEL_DIR, 'customer_predictor.joblib'))
 
 # Create directories if they don't exist
-for directory in [DATA_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR, LOG_DIR]:
+for directory in [DATA_DIR, RAW_DATA_DIR, PROCESSED_DATA_DIR, LOG_DIR, EXPORT_DIR, MODEL_DIR]:
     os.makedirs(directory, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""
+media_types.py: Query API Media Types
+
+This module holds the content types spoken by the query API, shared by the
+service and its client so the client does not import the service.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+"""
+
+ARROW_MIME = 'application/vnd.apache.arrow.stream'
+JSON_MIME = 'application/json'
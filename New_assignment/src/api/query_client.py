@@ -0,0 +1,236 @@
+"""
+query_client.py: Query API Client
+
+This module provides QueryClient, a drop-in replacement for DatabaseConnection
+that answers the dashboard's queries through the query API service instead of
+opening its own database connection. Identical queries issued by concurrent
+dashboard sessions are coalesced by the service.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Classes:
+    QueryClient
+        Calls the query API service with the DatabaseConnection method names
+
+Dependencies:
+    - pandas
+    - pyarrow (Arrow transfers only)
+"""
+
+import io
+import json
+import os
+import sys
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from config.config import API_CONFIG, EXPORT_CONFIG
+from src.api.media_types import ARROW_MIME, JSON_MIME
+
+# Ids per /customer_scores request, keeping each URL well under header limits
+IDS_PER_REQUEST = 1000
+
+
+def _param(value):
+    """Renders a query parameter, using ISO format for dates."""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class QueryClient:
+    """
+    Client for the query API service.
+
+    Exposes the same query methods as DatabaseConnection so the dashboard can
+    use either interchangeably.
+
+    Attributes:
+        base_url (str): Service URL, e.g. 'http://127.0.0.1:8600'
+        timeout (int): Request timeout in seconds
+        file_format (str): 'arrow' or 'json' transfer format for DataFrames
+    """
+
+    def __init__(self, base_url=None, timeout=None, file_format=None):
+        """
+        Initializes the client.
+
+        Args:
+            base_url (str, optional): Service URL, defaults to API_CONFIG['url']
+            timeout (int, optional): Request timeout, defaults to API_CONFIG['timeout']
+            file_format (str, optional): Transfer format; Arrow when pyarrow is installed
+        """
+        self.base_url = (base_url or API_CONFIG['url']).rstrip('/')
+        self.timeout = timeout or API_CONFIG['timeout']
+        if file_format is None:
+            try:
+                import pyarrow  # noqa: F401
+                file_format = 'arrow'
+            except ImportError:
+                file_format = 'json'
+        self.file_format = file_format
+
+    def _open(self, path, accept=JSON_MIME, **params):
+        """Sends a GET request and returns the open response."""
+        query = urlencode({name: _param(value) for name, value in params.items()})
+        request = Request(f"{self.base_url}{path}?{query}", headers={'Accept': accept})
+        return urlopen(request, timeout=self.timeout)
+
+    def _get_json(self, path, **params):
+        """Fetches a JSON endpoint."""
+        with self._open(path, **params) as response:
+            return json.load(response)
+
+    def _get_frame(self, path, **params):
+        """Fetches a DataFrame endpoint in the client's transfer format."""
+        accept = ARROW_MIME if self.file_format == 'arrow' else JSON_MIME
+        with self._open(path, accept=accept, **params) as response:
+            body = response.read()
+        if self.file_format == 'arrow':
+            import pyarrow as pa
+
+            return pa.ipc.open_stream(body).read_pandas()
+        return pd.read_json(io.StringIO(body.decode('utf-8')), orient='split')
+
+    def connect(self):
+        """
+        Checks that the service is reachable.
+
+        Returns:
+            QueryClient: self if the service answered, None otherwise
+        """
+        try:
+            self._get_json('/health')
+            print(f"Query API reachable at {self.base_url}")
+            return self
+        except (URLError, OSError) as e:
+            print(f"Error connecting to query API: {e}")
+            return None
+
+    def get_filtered_data(self, start_date, end_date, min_total_amount, min_orders):
+        """See DatabaseConnection.get_filtered_data."""
+        try:
+            df = self._get_frame(
+                '/filtered_data',
+                start_date=start_date,
+                end_date=end_date,
+                min_total_amount=min_total_amount,
+                min_orders=min_orders
+            )
+            if 'created_at' in df:
+                df['created_at'] = pd.to_datetime(df['created_at'])
+            return df
+        except Exception as e:
+            print(f"Error executing query: {e}")
+            return pd.DataFrame()
+
+    def iter_filtered_data(self, start_date, end_date, min_total_amount, min_orders,
+                           chunksize=None):
+        """See DatabaseConnection.iter_filtered_data; always transferred as Arrow."""
+        import pyarrow as pa
+
+        with self._open(
+            '/filtered_data/stream',
+            accept=ARROW_MIME,
+            start_date=start_date,
+            end_date=end_date,
+            min_total_amount=min_total_amount,
+            min_orders=min_orders,
+            chunksize=chunksize or EXPORT_CONFIG['chunksize']
+        ) as response:
+            for batch in pa.ipc.open_stream(response):
+                yield batch.to_pandas()
+
+    def get_summary_metrics(self, start_date, end_date):
+        """See DatabaseConnection.get_summary_metrics."""
+        try:
+            return self._get_frame('/summary_metrics', start_date=start_date, end_date=end_date)
+        except Exception as e:
+            print(f"Error getting summary metrics: {e}")
+            return pd.DataFrame()
+
+    def test_data_exists(self):
+        """See DatabaseConnection.test_data_exists; dates are returned as pd.Timestamp."""
+        try:
+            result = self._get_json('/data_exists')
+            min_date, max_date = (
+                pd.Timestamp(result[name]) if result[name] is not None else None
+                for name in ('min_date', 'max_date')
+            )
+            return result['customers_count'], result['orders_count'], min_date, max_date
+        except Exception as e:
+            print(f"Error testing data: {e}")
+            return 0, 0, None, None
+
+    def get_order_activity(self):
+        """See DatabaseConnection.get_order_activity."""
+        try:
+            return self._get_frame('/order_activity')
+        except Exception as e:
+            print(f"Error getting order activity: {e}")
+            return pd.DataFrame(columns=['customer_id', 'created_at'])
+
+    def get_data_version(self):
+        """See DatabaseConnection.get_data_version."""
+        try:
+            return tuple(self._get_json('/data_version'))
+        except Exception as e:
+            print(f"Error getting data version: {e}")
+            return 0, None
+
+    def has_negative_amounts(self, start_date, end_date):
+        """See DatabaseConnection.has_negative_amounts."""
+        try:
+            return bool(self._get_json('/negative_amounts', start_date=start_date, end_date=end_date))
+        except Exception as e:
+            print(f"Error checking for negative amounts: {e}")
+            return True
+
+    def get_customer_scores(self, customer_ids=None):
+        """
+        See DatabaseConnection.get_customer_scores.
+
+        Only the requested customers are transferred, in batches of
+        IDS_PER_REQUEST ids per request.
+        """
+        try:
+            if customer_ids is None:
+                return self._get_frame('/customer_scores')
+
+            customer_ids = sorted({int(customer_id) for customer_id in customer_ids})
+            frames = [
+                self._get_frame(
+                    '/customer_scores',
+                    customer_ids=','.join(map(str, customer_ids[i:i + IDS_PER_REQUEST]))
+                )
+                for i in range(0, len(customer_ids), IDS_PER_REQUEST)
+            ]
+        except Exception as e:
+            print(f"Error getting customer scores: {e}")
+            return pd.DataFrame()
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def predict(self, orders, total_amount):
+        """
+        Predicts whether a customer is a repeat purchaser, as CustomerPredictor.predict.
+
+        Args:
+            orders (int): Number of orders
+            total_amount (float): Total amount spent
+
+        Returns:
+            Tuple: (prediction, probabilities), or (None, message) if no model is available
+        """
+        try:
+            result = self._get_json('/predict', orders=orders, total_amount=total_amount)
+        except Exception as e:
+            print(f"Error getting prediction: {e}")
+            return None, str(e)
+        if result['prediction'] is None:
+            return None, result['message']
+        return result['prediction'], result['probability']
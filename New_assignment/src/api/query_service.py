@@ -0,0 +1,551 @@
+"""
+query_service.py: Headless Query API Service
+
+This module exposes the DatabaseConnection query methods over a small asyncio
+HTTP service so that many dashboard sessions can share one set of database
+queries. Concurrent identical requests are coalesced ("single-flight"): the
+first request runs the query and every other request for the same key awaits
+the same in-flight result, so database load follows the number of distinct
+queries rather than the number of users.
+
+Backpressure is applied in two places: database queries run on a bounded
+thread pool (API_CONFIG['max_concurrent_queries']), and once
+API_CONFIG['max_pending_requests'] requests are waiting the service answers
+503 with a Retry-After header instead of queueing more work.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Endpoints (all GET):
+    /health
+    /filtered_data?start_date&end_date&min_total_amount&min_orders[&format]
+    /filtered_data/stream?start_date&end_date&min_total_amount&min_orders[&chunksize]
+    /summary_metrics?start_date&end_date[&format]
+    /data_exists
+    /data_version
+    /negative_amounts?start_date&end_date
+    /order_activity[?format]
+    /customer_scores[?customer_ids][&format]
+    /predict?orders&total_amount
+
+    DataFrame endpoints answer JSON (orient='split') by default, or an Arrow
+    IPC stream with format=arrow or an Accept header of ARROW_MIME.
+
+Classes:
+    SingleFlight
+        Shares one in-flight awaitable between concurrent callers with the same key
+    QueryService
+        HTTP front end over DatabaseConnection with coalescing and backpressure
+
+Dependencies:
+    - pandas
+    - pyarrow (Arrow responses only)
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from config.config import API_CONFIG, EXPORT_CONFIG, MODEL_PATH
+from src.api.media_types import ARROW_MIME, JSON_MIME
+from src.utils.database_utils import DatabaseConnection
+from src.utils.export_utils import normalize_chunk
+from src.utils.ml_utils import CustomerPredictor
+
+HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    406: 'Not Acceptable',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same future. The key is forgotten as soon as the
+    work finishes, so later calls always see fresh data.
+
+    Attributes:
+        calls (int): Number of executions started
+        coalesced (int): Number of callers that joined an in-flight execution
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Runs fn() once per key among concurrent callers.
+
+        Args:
+            key (hashable): Identity of the work
+            fn (callable): Coroutine function producing the result
+
+        Returns:
+            Any: Result of the shared execution
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A cancelled waiter must not cancel the work other callers share
+        return await asyncio.shield(future)
+
+
+class RequestError(Exception):
+    """Raised for malformed requests; carries the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode_frame(df, file_format):
+    """
+    Serializes a DataFrame for a response.
+
+    Args:
+        df (pd.DataFrame): Data to serialize
+        file_format (str): 'json' or 'arrow'
+
+    Returns:
+        Tuple[str, bytes]: Content type and body
+    """
+    if file_format == 'arrow':
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as stream_writer:
+            stream_writer.write_table(table)
+        return ARROW_MIME, sink.getvalue()
+    return JSON_MIME, df.to_json(orient='split', index=False, date_format='iso').encode('utf-8')
+
+
+def _encode_json(payload):
+    """Serializes a JSON payload, rendering dates and decimals as strings."""
+    return JSON_MIME, json.dumps(payload, default=str).encode('utf-8')
+
+
+def _timestamp(params, name):
+    """Parses a required date parameter into a datetime."""
+    try:
+        return pd.Timestamp(params[name]).to_pydatetime()
+    except KeyError:
+        raise RequestError(400, f"Missing parameter: {name}")
+    except ValueError:
+        raise RequestError(400, f"Invalid date for {name}: {params[name]}")
+
+
+def _number(params, name, cast, default=None):
+    """Parses a numeric parameter, falling back to default when absent."""
+    if name not in params:
+        if default is None:
+            raise RequestError(400, f"Missing parameter: {name}")
+        return default
+    try:
+        return cast(params[name])
+    except ValueError:
+        raise RequestError(400, f"Invalid number for {name}: {params[name]}")
+
+
+def _ids(params, name):
+    """Parses an optional comma-separated list of ids, sorted and deduplicated."""
+    if not params.get(name):
+        return None
+    try:
+        return tuple(sorted({int(value) for value in params[name].split(',')}))
+    except ValueError:
+        raise RequestError(400, f"Invalid ids for {name}: {params[name]}")
+
+
+class QueryService:
+    """
+    Asyncio HTTP service over DatabaseConnection.
+
+    Attributes:
+        db_connection (DatabaseConnection): Connected database wrapper
+        predictor (CustomerPredictor): Model served by /predict, loaded from model_path on first use
+        model_path (str): Model persisted by the batch scoring job
+        max_pending_requests (int): Requests admitted before answering 503
+        stats (dict): Request, rejection and coalescing counters
+
+    Methods:
+        start(host, port) -> asyncio.base_events.Server:
+            Starts listening
+        serve_forever(host, port):
+            Starts listening and serves until cancelled
+    """
+
+    def __init__(self, db_connection, predictor=None, max_concurrent_queries=None,
+                 max_pending_requests=None, model_path=None):
+        """
+        Initializes the service.
+
+        Args:
+            db_connection (DatabaseConnection): Connected database wrapper
+            predictor (CustomerPredictor, optional): Model for /predict
+            max_concurrent_queries (int, optional): Size of the query thread pool
+            max_pending_requests (int, optional): Admission limit before 503
+            model_path (str, optional): Model file, defaults to MODEL_PATH
+        """
+        self.db_connection = db_connection
+        self.predictor = predictor or CustomerPredictor()
+        self.model_path = model_path or MODEL_PATH
+        self.max_pending_requests = max_pending_requests or API_CONFIG['max_pending_requests']
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_queries or API_CONFIG['max_concurrent_queries'],
+            thread_name_prefix='query'
+        )
+        self._flights = SingleFlight()
+        self._model_lock = threading.Lock()
+        self._pending = 0
+        self.stats = {'requests': 0, 'rejected': 0}
+
+        self._routes = {
+            '/health': self._health,
+            '/filtered_data': self._filtered_data,
+            '/summary_metrics': self._summary_metrics,
+            '/data_exists': self._data_exists,
+            '/data_version': self._data_version,
+            '/negative_amounts': self._negative_amounts,
+            '/order_activity': self._order_activity,
+            '/customer_scores': self._customer_scores,
+            '/predict': self._predict
+        }
+
+    async def _run(self, key, fn, *args):
+        """Runs a blocking function on the query pool, coalesced by key."""
+        loop = asyncio.get_running_loop()
+
+        async def flight():
+            return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+        return await self._flights.do(key, flight)
+
+    # Handlers return (status, content type, body)
+
+    async def _health(self, params, file_format):
+        stats = dict(
+            self.stats,
+            pending=self._pending,
+            queries=self._flights.calls,
+            coalesced=self._flights.coalesced
+        )
+        return (200,) + _encode_json({'status': 'ok', 'stats': stats})
+
+    async def _filtered_data(self, params, file_format):
+        start_date = _timestamp(params, 'start_date')
+        end_date = _timestamp(params, 'end_date')
+        min_total_amount = _number(params, 'min_total_amount', float, 0.0)
+        min_orders = _number(params, 'min_orders', int, 0)
+
+        def query():
+            df = self.db_connection.get_filtered_data(start_date, end_date, min_total_amount, min_orders)
+            return _encode_frame(df, file_format)
+
+        key = ('filtered_data', start_date, end_date, min_total_amount, min_orders, file_format)
+        return (200,) + await self._run(key, query)
+
+    async def _summary_metrics(self, params, file_format):
+        start_date = _timestamp(params, 'start_date')
+        end_date = _timestamp(params, 'end_date')
+
+        def query():
+            return _encode_frame(self.db_connection.get_summary_metrics(start_date, end_date), file_format)
+
+        key = ('summary_metrics', start_date, end_date, file_format)
+        return (200,) + await self._run(key, query)
+
+    async def _data_exists(self, params, file_format):
+        def query():
+            customers_count, orders_count, min_date, max_date = self.db_connection.test_data_exists()
+            return _encode_json({
+                'customers_count': customers_count,
+                'orders_count': orders_count,
+                'min_date': min_date,
+                'max_date': max_date
+            })
+
+        return (200,) + await self._run(('data_exists',), query)
+
+    async def _data_version(self, params, file_format):
+        def query():
+            return _encode_json(list(self.db_connection.get_data_version()))
+
+        return (200,) + await self._run(('data_version',), query)
+
+    async def _negative_amounts(self, params, file_format):
+        start_date = _timestamp(params, 'start_date')
+        end_date = _timestamp(params, 'end_date')
+
+        def query():
+            return _encode_json(self.db_connection.has_negative_amounts(start_date, end_date))
+
+        return (200,) + await self._run(('negative_amounts', start_date, end_date), query)
+
+    async def _order_activity(self, params, file_format):
+        def query():
+            return _encode_frame(self.db_connection.get_order_activity(), file_format)
+
+        return (200,) + await self._run(('order_activity', file_format), query)
+
+    async def _customer_scores(self, params, file_format):
+        customer_ids = _ids(params, 'customer_ids')
+
+        def query():
+            df = self.db_connection.get_customer_scores(
+                list(customer_ids) if customer_ids is not None else None
+            )
+            return _encode_frame(df, file_format)
+
+        return (200,) + await self._run(('customer_scores', customer_ids, file_format), query)
+
+    def _ensure_loaded(self):
+        """
+        Loads the batch scoring job's model, so predictions match customer_scores.
+
+        Retried on every request until a model is available.
+
+        Returns:
+            str: Why no model is available, or None once it is loaded
+        """
+        with self._model_lock:
+            if self.predictor.is_trained:
+                return None
+            try:
+                self.predictor = CustomerPredictor.load(self.model_path)
+            except Exception as e:
+                print(f"Error loading model from {self.model_path}: {e}")
+                return "No model available; run src/utils/scoring_utils.py to train one"
+            print(f"Loaded model {self.predictor.model_version} from {self.model_path}")
+            return None
+
+    async def _predict(self, params, file_format):
+        orders = _number(params, 'orders', int)
+        total_amount = _number(params, 'total_amount', float)
+
+        def query():
+            message = self._ensure_loaded()
+            if message is not None:
+                return _encode_json({'prediction': None, 'message': message})
+            prediction, probability = self.predictor.predict(orders, total_amount)
+            return _encode_json({
+                'prediction': int(prediction),
+                'probability': probability.tolist(),
+                'model_version': self.predictor.model_version
+            })
+
+        return (200,) + await self._run(('predict', orders, total_amount), query)
+
+    async def _stream_filtered_data(self, writer, params):
+        """
+        Streams filtered data as an Arrow IPC stream, one record batch per chunk.
+
+        Streams are not coalesced: each export reads its own server-side cursor.
+        """
+        start_date = _timestamp(params, 'start_date')
+        end_date = _timestamp(params, 'end_date')
+        min_total_amount = _number(params, 'min_total_amount', float, 0.0)
+        min_orders = _number(params, 'min_orders', int, 0)
+        chunksize = _number(params, 'chunksize', int, EXPORT_CONFIG['chunksize'])
+
+        loop = asyncio.get_running_loop()
+        chunks = self.db_connection.iter_filtered_data(
+            start_date, end_date, min_total_amount, min_orders, chunksize=chunksize
+        )
+        headers_sent = False
+        try:
+            # Fetch the first chunk before answering so query errors still get a 500
+            chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+            self._write_head(writer, 200, ARROW_MIME)
+            headers_sent = True
+            await self._write_batches(writer, chunks, chunk)
+        finally:
+            try:
+                await loop.run_in_executor(self._executor, chunks.close)
+            except Exception as e:
+                # After the headers an error response would corrupt the stream
+                if not headers_sent:
+                    raise
+                print(f"Error closing filtered data stream: {e}")
+
+    async def _write_batches(self, writer, chunks, chunk):
+        """Encodes chunks as Arrow record batches after the headers are sent."""
+        import pyarrow as pa
+
+        loop = asyncio.get_running_loop()
+        sink = io.BytesIO()
+        stream_writer = None
+        schema = None
+        try:
+            while chunk is not None:
+                chunk = normalize_chunk(chunk)
+                if stream_writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    schema = table.schema
+                    stream_writer = pa.ipc.new_stream(sink, schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                stream_writer.write_table(table)
+
+                # Hand the encoded batch to the socket and reuse the buffer
+                writer.write(sink.getvalue())
+                sink.seek(0)
+                sink.truncate()
+                await writer.drain()
+                chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+
+            if stream_writer is not None:
+                stream_writer.close()
+                writer.write(sink.getvalue())
+        except Exception as e:
+            # Headers are already sent, so the stream can only be cut short
+            print(f"Error streaming filtered data: {e}")
+
+    @staticmethod
+    def _write_head(writer, status, content_type, content_length=None, extra_headers=None):
+        """Writes the status line and headers of a response."""
+        lines = [
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}",
+            f"Content-Type: {content_type}",
+            "Connection: close"
+        ]
+        if content_length is not None:
+            lines.append(f"Content-Length: {content_length}")
+        for name, value in (extra_headers or {}).items():
+            lines.append(f"{name}: {value}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+
+    def _respond(self, writer, status, content_type, body, extra_headers=None):
+        """Writes a complete response."""
+        self._write_head(writer, status, content_type, len(body), extra_headers)
+        writer.write(body)
+
+    def _error(self, writer, status, message, extra_headers=None):
+        """Writes a JSON error response."""
+        self._respond(writer, status, *_encode_json({'error': message}), extra_headers=extra_headers)
+
+    async def _handle(self, reader, writer):
+        """Serves one HTTP request per connection."""
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1')
+                if line in ('\r\n', '\n', ''):
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            self.stats['requests'] += 1
+            try:
+                method, target, _ = request_line.split(' ', 2)
+            except ValueError:
+                self._error(writer, 400, "Malformed request line")
+                return
+            if method != 'GET':
+                self._error(writer, 405, "Only GET is supported")
+                return
+
+            url = urlsplit(target)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            handler = self._routes.get(url.path)
+            if handler is None and url.path != '/filtered_data/stream':
+                self._error(writer, 404, f"Unknown endpoint: {url.path}")
+                return
+
+            # Shed load rather than queue without bound
+            if self._pending >= self.max_pending_requests:
+                self.stats['rejected'] += 1
+                self._error(writer, 503, "Too many pending requests", {'Retry-After': '1'})
+                return
+
+            file_format = params.get('format')
+            if file_format is None:
+                file_format = 'arrow' if ARROW_MIME in headers.get('accept', '') else 'json'
+            if file_format not in ('json', 'arrow'):
+                self._error(writer, 406, f"Unsupported format: {file_format}")
+                return
+
+            self._pending += 1
+            try:
+                if handler is None:
+                    await self._stream_filtered_data(writer, params)
+                else:
+                    status, content_type, body = await handler(params, file_format)
+                    self._respond(writer, status, content_type, body)
+            finally:
+                self._pending -= 1
+        except RequestError as e:
+            self._error(writer, e.status, str(e))
+        except Exception as e:
+            print(f"Error handling request: {e}")
+            self._error(writer, 500, str(e))
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host=None, port=None):
+        """
+        Starts listening for requests.
+
+        Args:
+            host (str, optional): Bind address, defaults to API_CONFIG['host']
+            port (int, optional): Bind port, defaults to API_CONFIG['port']
+
+        Returns:
+            asyncio.base_events.Server: The listening server
+        """
+        server = await asyncio.start_server(
+            self._handle,
+            host or API_CONFIG['host'],
+            API_CONFIG['port'] if port is None else port
+        )
+        for sock in server.sockets:
+            print(f"Query API listening on {sock.getsockname()}")
+        return server
+
+    async def serve_forever(self, host=None, port=None):
+        """Starts listening and serves requests until cancelled."""
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    db_connection = DatabaseConnection()
+    if db_connection.connect() is None:
+        print("Query API not started: database connection failed.")
+        return
+    asyncio.run(QueryService(db_connection).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,40 @@ import pymysql
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from src.utils.database_utils import DatabaseConnection
 from src.utils.ml_utils import CustomerPredictor
+from src.utils.cohort_utils import build_cohort_matrix, retention_matrix
+from src.utils.filter_cache import FilteredDataCache
+from src.utils.export_utils import EXPORT_FORMATS, export_file_name, export_filtered_data
+from src.api.query_client import QueryClient
+from config.config import API_CONFIG, EXPORT_DIR
 
-# Initialize database connection
+# Initialize database connection, or the query API client when QUERY_API_URL is set
 @st.cache_resource
 def init_db_connection():
+    if API_CONFIG['url']:
+        db_connection = QueryClient(API_CONFIG['url'])
+        if db_connection.connect() is None:
+            st.error("Failed to reach the query API.")
+        return db_connection
+    
     db_connection = DatabaseConnection()
     engine = db_connection.connect()
     if engine is None:
         st.error("Failed to connect to the database.")
     return db_connection
 
+# Cohort matrices are recomputed only when the orders table changes
+@st.cache_data(max_entries=1)
+def load_cohort_retention(_db_connection, data_version):
+    activity = _db_connection.get_order_activity()
+    cohort_counts = build_cohort_matrix(activity['customer_id'], activity['created_at'])
+    return cohort_counts, retention_matrix(cohort_counts)
+
+# Only the latest export of a session is kept on disk
+def discard_export():
+    export_path = st.session_state.pop('export_path', None)
+    if export_path and os.path.exists(export_path):
+        os.remove(export_path)
+
 def main():
     st.title("Customer Orders Dashboard")
     
@@ -62,8 +86,12 @@ def main():
         index=0
     )
     
-    # Retrieve data from database
-    filtered_data = db_connection.get_filtered_data(
+    # Retrieve data, reusing this session's last result when the filter only narrowed;
+    # scores and the data version are kept with that result as well
+    if 'filtered_data_cache' not in st.session_state:
+        st.session_state['filtered_data_cache'] = FilteredDataCache(db_connection)
+    filter_cache = st.session_state['filtered_data_cache']
+    filtered_data = filter_cache.get_filtered_data(
         start_date=start_date,
         end_date=end_date,
         min_total_amount=min_amount,
@@ -100,6 +128,24 @@ def main():
     )
     st.plotly_chart(fig_top_customers)
     
+    # Repeat purchase scores written by the batch scoring job
+    st.header("Repeat Purchase Likelihood")
+    customer_scores = filter_cache.get_customer_scores(filtered_data['customer_id'].unique())
+    if customer_scores.empty:
+        st.info("No customer scores yet. Run src/utils/scoring_utils.py to score customers.")
+    else:
+        likely_repeat = int((customer_scores['is_repeat_prediction'] == 1).sum())
+        st.metric("Likely Repeat Customers", f"{likely_repeat:,} of {len(customer_scores):,}")
+        fig_scores = px.histogram(
+            customer_scores,
+            x='repeat_probability',
+            nbins=20,
+            labels={'repeat_probability': 'Repeat Purchase Probability'},
+            title="Repeat Purchase Probability of Filtered Customers"
+        )
+        st.plotly_chart(fig_scores)
+        st.caption(f"Model version {customer_scores['model_version'].mode().iloc[0]}")
+    
     # Revenue over time
     st.header("Revenue Over Time")
     daily_revenue = filtered_data.groupby(filtered_data['created_at'].dt.date)['total_amount'].sum().reset_index()
@@ -114,6 +160,24 @@ def main():
     )
     st.plotly_chart(fig_revenue)
     
+    # Cohort retention over the full order history
+    st.header("Customer Cohort Retention")
+    cohort_counts, retention = load_cohort_retention(
+        db_connection, filter_cache.get_data_version()
+    )
+    if retention.empty:
+        st.info("Not enough order history to build cohorts.")
+    else:
+        fig_retention = px.imshow(
+            retention * 100,
+            labels={'x': 'Months Since First Order', 'y': 'First Order Month', 'color': 'Retention (%)'},
+            color_continuous_scale='Blues',
+            aspect='auto',
+            title="Monthly Retention by First-Order Cohort"
+        )
+        st.plotly_chart(fig_retention)
+        st.caption(f"{int(cohort_counts[0].sum()):,} customers across {len(cohort_counts)} cohorts")
+    
     # Filtered data table
     st.header("Filtered Orders")
     st.dataframe(
@@ -121,6 +185,51 @@ def main():
         .sort_values('created_at', ascending=False)
     )
     
+    # Export filtered orders
+    st.header("Export Filtered Orders")
+    col1, col2 = st.columns(2)
+    with col1:
+        export_format = st.selectbox("Format", options=list(EXPORT_FORMATS))
+    with col2:
+        export_compression = st.selectbox(
+            "Compression",
+            options=EXPORT_FORMATS[export_format],
+            format_func=lambda codec: codec or "none"
+        )
+    
+    if st.button("Prepare Export"):
+        discard_export()
+        
+        export_path = os.path.join(EXPORT_DIR, export_file_name(export_format, export_compression))
+        try:
+            with st.spinner("Exporting filtered orders..."):
+                exported_rows = export_filtered_data(
+                    db_connection,
+                    export_path,
+                    start_date=start_date,
+                    end_date=end_date,
+                    min_total_amount=min_amount,
+                    min_orders=min_orders,
+                    file_format=export_format,
+                    compression=export_compression
+                )
+            st.session_state['export_path'] = export_path
+            st.success(f"Exported {exported_rows:,} rows.")
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+    
+    # The file is deleted once downloaded so later reruns stop rereading it
+    export_path = st.session_state.get('export_path')
+    if export_path and os.path.exists(export_path):
+        with open(export_path, 'rb') as export_file:
+            st.download_button(
+                "Download Export",
+                data=export_file,
+                file_name=os.path.basename(export_path),
+                mime="application/octet-stream",
+                on_click=discard_export
+            )
+    
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,134 @@
+"""
+cohort_utils.py: Cohort and Retention Analytics
+
+This module builds monthly customer cohort matrices from raw order activity.
+Customers are grouped by the month of their first order, and each cohort is
+followed through the months after it to count how many of its customers
+ordered again.
+
+The matrix is built in a single vectorized pass: customer ids are encoded as
+integer codes, months as integer month numbers, and the per-cell customer
+counts come from one np.bincount over the flattened (cohort, age) index, so
+the cost stays close to a sort over the orders rather than a groupby per
+customer.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Functions:
+    build_cohort_matrix(customer_ids, created_at) -> pd.DataFrame
+        Counts active customers per first-order month and months since first order
+    retention_matrix(cohort_counts) -> pd.DataFrame
+        Converts cohort counts into retention rates
+
+Dependencies:
+    - numpy
+    - pandas
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _month_numbers(created_at):
+    """
+    Encodes timestamps as integer month numbers (months since 1970-01).
+
+    Args:
+        created_at (array-like): Order timestamps
+
+    Returns:
+        np.ndarray: int64 month number per order, with -1 for missing dates
+    """
+    timestamps = pd.to_datetime(pd.Series(created_at), errors='coerce').to_numpy(dtype='datetime64[ns]')
+    months = timestamps.astype('datetime64[M]').astype(np.int64)
+    months[np.isnat(timestamps)] = -1
+    return months
+
+
+def build_cohort_matrix(customer_ids, created_at):
+    """
+    Counts active customers per cohort month and months since first order.
+
+    Args:
+        customer_ids (array-like): Customer id of each order
+        created_at (array-like): Timestamp of each order
+
+    Returns:
+        pd.DataFrame: One row per cohort month (index 'YYYY-MM'), one column per
+                      month offset (0 = first-order month); each cell is the
+                      number of distinct cohort customers who ordered that month
+    """
+    months = _month_numbers(created_at)
+    codes, _ = pd.factorize(pd.Series(customer_ids).to_numpy())
+
+    # Orders without a date or customer cannot be placed in a cohort
+    valid = (months >= 0) & (codes >= 0)
+    months = months[valid]
+    codes = codes[valid]
+    if len(months) == 0:
+        return pd.DataFrame(dtype=np.int64)
+
+    base_month = months.min()
+    months = months - base_month
+    n_months = int(months.max()) + 1
+    n_customers = int(codes.max()) + 1
+
+    # One entry per (customer, active month); ordering by code then month also
+    # puts each customer's first month first. A plain sort plus adjacent
+    # comparison is much faster than np.unique on millions of keys.
+    activity = np.sort(codes * n_months + months)
+    activity = activity[np.concatenate(([True], activity[1:] != activity[:-1]))]
+    activity_codes = activity // n_months
+    activity_months = activity % n_months
+
+    # The first entry of each customer's run is its first active month
+    starts = np.r_[True, activity_codes[1:] != activity_codes[:-1]]
+    first_month = np.empty(n_customers, dtype=np.int64)
+    first_month[activity_codes[starts]] = activity_months[starts]
+
+    cohorts = first_month[activity_codes]
+    ages = activity_months - cohorts
+    counts = np.bincount(cohorts * n_months + ages, minlength=n_months * n_months)
+    counts = counts.reshape(n_months, n_months)
+
+    # Drop months in which no cohort started and trailing ages nobody reached
+    cohort_rows = np.flatnonzero(counts[:, 0])
+    max_age = int(ages.max()) + 1
+    matrix = counts[cohort_rows, :max_age]
+
+    labels = (np.datetime64('1970-01', 'M') + (cohort_rows + base_month)).astype(str)
+    cohort_counts = pd.DataFrame(
+        matrix,
+        index=pd.Index(labels, name='cohort'),
+        columns=pd.RangeIndex(max_age, name='months_since_first_order')
+    )
+    # Last month with any activity, used to tell unreached ages from zero retention
+    cohort_counts.attrs['last_month'] = str(np.datetime64('1970-01', 'M') + (n_months - 1 + base_month))
+    return cohort_counts
+
+
+def retention_matrix(cohort_counts):
+    """
+    Converts a cohort count matrix into retention rates.
+
+    Args:
+        cohort_counts (pd.DataFrame): Output of build_cohort_matrix
+
+    Returns:
+        pd.DataFrame: Share of each cohort active in each later month (0-1);
+                      months a cohort has not reached yet are NaN
+    """
+    if cohort_counts.empty:
+        return cohort_counts.astype(float)
+
+    counts = cohort_counts.to_numpy(dtype=float)
+    rates = counts / counts[:, [0]]
+
+    # A cohort starting k months before the last active month can only reach ages 0..k
+    last_month = np.datetime64(cohort_counts.attrs.get('last_month', cohort_counts.index[-1]), 'M')
+    cohort_months = cohort_counts.index.to_numpy().astype('datetime64[M]')
+    remaining = (last_month - cohort_months).astype(np.int64)
+    rates[np.arange(rates.shape[1])[None, :] > remaining[:, None]] = np.nan
+
+    return pd.DataFrame(rates, index=cohort_counts.index, columns=cohort_counts.columns)
@@ -12,10 +12,34 @@ Functions:
         Establishes and tests database connection
     get_filtered_data(start_date, end_date, min_total_amount, min_orders) -> pd.DataFrame
         Retrieves filtered customer and order data
+    iter_filtered_data(start_date, end_date, min_total_amount, min_orders, chunksize) -> Iterator[pd.DataFrame]
+        Streams the same filtered data in chunks from a server-side cursor
     get_summary_metrics(start_date, end_date) -> pd.DataFrame
         Calculates summary statistics for orders
     test_data_exists() -> Tuple[int, int, datetime, datetime]
         Verifies data existence and returns counts and date ranges
+    get_order_activity() -> pd.DataFrame
+        Retrieves customer id and order date of every order
+    get_data_version() -> Tuple[int, str]
+        Returns a cheap fingerprint of the orders table for cache keys
+    has_negative_amounts(start_date, end_date) -> bool
+        Checks whether a date range contains refunds (negative order amounts)
+    iter_customer_features(since, chunksize) -> Iterator[pd.DataFrame]
+        Pages through per-customer order count, spend and latest order date
+    write_customer_scores(scores) -> int
+        Upserts batch model scores into the customer_scores table
+    get_order_watermark() -> datetime
+        Returns the latest order date on the primary
+    get_scoring_watermark(model_version) -> datetime
+        Returns the order watermark of a model version's last completed scoring run
+    record_scoring_run(model_version, watermark) -> None
+        Records a completed scoring run and its order watermark
+    get_customer_scores(customer_ids) -> pd.DataFrame
+        Looks up stored model scores
+
+Read-only queries are routed to a pool of read replicas when any are
+configured (see REPLICA_CONFIG and replica_pool.py); writes and ingest stay on
+the primary engine.
 
 Classes:
     DatabaseConnection
@@ -29,14 +53,94 @@ Dependencies:
 """
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import (
+    Column, DateTime, Float, Integer, MetaData, String, Table, create_engine, select, text
+)
+from contextlib import nullcontext
 from datetime import datetime
 import sys
 import os
 import pymysql  # Ensure pymysql is imported
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from config.config import DB_CONFIG  
+from config.config import DB_CONFIG, REPLICA_CONFIG
+from src.utils.replica_pool import ReplicaPool
+
+# Customers meeting the spend/order thresholds in a date range, with their orders
+FILTERED_DATA_QUERY = """
+WITH customer_stats AS (
+    SELECT
+        c.customer_id,
+        c.name,
+        COUNT(o.display_order_id) AS order_count,
+        SUM(o.total_amount) AS total_spent
+    FROM customers c
+    LEFT JOIN orders o ON c.customer_id = o.customer_id
+    WHERE o.created_at BETWEEN :start_date AND :end_date
+    AND o.created_at IS NOT NULL
+    GROUP BY c.customer_id, c.name
+    HAVING SUM(o.total_amount) >= :min_total_amount
+        AND COUNT(o.display_order_id) >= :min_orders
+)
+SELECT
+    cs.customer_id,
+    cs.name,
+    cs.order_count,
+    cs.total_spent,
+    o.display_order_id,
+    o.created_at,
+    o.total_amount
+FROM customer_stats cs
+JOIN orders o ON cs.customer_id = o.customer_id
+WHERE o.created_at BETWEEN :start_date AND :end_date
+AND o.created_at IS NOT NULL
+ORDER BY o.created_at DESC
+"""
+
+
+# Per-customer features used by the repeat-purchase model, one keyset page at a time
+CUSTOMER_FEATURES_QUERY = """
+SELECT
+    customer_id,
+    COUNT(display_order_id) AS order_count,
+    SUM(total_amount) AS total_spent,
+    MAX(created_at) AS last_order_at
+FROM orders
+WHERE created_at IS NOT NULL
+AND customer_id > :after
+GROUP BY customer_id
+{having}
+ORDER BY customer_id
+LIMIT :limit
+"""
+
+# Bounded IN lists keep each statement within driver bind-parameter limits
+IN_LIST_SIZE = 1000
+
+metadata = MetaData()
+
+# Batch model output written by scoring_utils.py and read by the dashboard
+customer_scores = Table(
+    'customer_scores', metadata,
+    Column('customer_id', Integer, primary_key=True, autoincrement=False),
+    Column('order_count', Integer),
+    Column('total_spent', Float),
+    Column('last_order_at', DateTime),
+    Column('is_repeat_prediction', Integer),
+    Column('repeat_probability', Float),
+    Column('model_version', String(32), index=True),
+    Column('scored_at', DateTime)
+)
+
+# Last completed scoring run per model version; watermark is the primary's
+# latest order date captured when that run started
+scoring_runs = Table(
+    'scoring_runs', metadata,
+    Column('model_version', String(32), primary_key=True),
+    Column('watermark', DateTime),
+    Column('completed_at', DateTime)
+)
+
 
 class DatabaseConnection:
     """
@@ -46,8 +150,10 @@ class DatabaseConnection:
     data retrieval, and metric calculations.
     
     Attributes:
-        connection_string (str): SQLAlchemy connection string
-        engine (sqlalchemy.engine.Engine): Database engine instance
+        connection_string (str): SQLAlchemy connection string of the primary
+        replica_connection_strings (list): SQLAlchemy connection strings of the read replicas
+        engine (sqlalchemy.engine.Engine): Primary database engine, used for writes
+        replicas (ReplicaPool): Pool routing read-only queries, set by connect()
         
     Methods:
         connect() -> sqlalchemy.engine.Engine:
@@ -55,26 +161,93 @@ class DatabaseConnection:
         get_filtered_data(start_date: datetime, end_date: datetime, 
                          min_total_amount: float, min_orders: int) -> pd.DataFrame:
             Retrieves filtered customer and order data
+        iter_filtered_data(start_date: datetime, end_date: datetime, min_total_amount: float,
+                           min_orders: int, chunksize: int) -> Iterator[pd.DataFrame]:
+            Streams filtered customer and order data in chunks
         get_summary_metrics(start_date: datetime, end_date: datetime) -> pd.DataFrame:
             Calculates order summary statistics
         test_data_exists() -> Tuple[int, int, datetime, datetime]:
             Verifies database data and returns statistics
+        get_order_activity() -> pd.DataFrame:
+            Retrieves customer id and order date of every order
+        get_data_version() -> Tuple[int, str]:
+            Returns the order count and latest order date as a data version
+        has_negative_amounts(start_date: datetime, end_date: datetime) -> bool:
+            Checks whether a date range contains negative order amounts
+        iter_customer_features(since: datetime, chunksize: int) -> Iterator[pd.DataFrame]:
+            Pages through per-customer model features
+        write_customer_scores(scores: pd.DataFrame) -> int:
+            Upserts model scores on the primary
+        get_order_watermark() -> datetime:
+            Returns the latest order date on the primary
+        get_scoring_watermark(model_version: str) -> datetime:
+            Returns the watermark of the last completed scoring run
+        record_scoring_run(model_version: str, watermark: datetime) -> None:
+            Records a completed scoring run
+        get_customer_scores(customer_ids: list) -> pd.DataFrame:
+            Looks up stored model scores
     """
 
     
-    def __init__(self):
+    def __init__(self, connection_string=None, replica_connection_strings=None,
+                 routing_strategy=None, max_replica_lag=None):
         """
         Initializes the database connection with configuration from DB_CONFIG.
         Constructs the connection string and initializes the engine attribute.
+        
+        Args:
+            connection_string (str, optional): Primary connection string;
+                built from DB_CONFIG when omitted
+            replica_connection_strings (list, optional): Read-replica connection
+                strings; built from REPLICA_CONFIG['hosts'] when omitted
+            routing_strategy (str, optional): 'round_robin' or 'least_latency'
+            max_replica_lag (int, optional): Maximum tolerated replica lag in seconds
         """
         
         # Debug print to verify DB_CONFIG
         print("DB_CONFIG:", DB_CONFIG)
         
-        self.connection_string = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}"
+        if connection_string is None:
+            connection_string = self._mysql_url(DB_CONFIG['host'])
+        if replica_connection_strings is None:
+            replica_connection_strings = [self._mysql_url(host) for host in REPLICA_CONFIG['hosts']]
+        
+        self.connection_string = connection_string
+        self.replica_connection_strings = list(replica_connection_strings)
+        self.routing_strategy = routing_strategy or REPLICA_CONFIG['strategy']
+        self.max_replica_lag = (
+            REPLICA_CONFIG['max_lag_seconds'] if max_replica_lag is None else max_replica_lag
+        )
         # Debug print to verify connection string
         print("Connection string:", self.connection_string)
         self.engine = None
+        self.replicas = None
+        
+    @staticmethod
+    def _mysql_url(host):
+        """Builds a MySQL connection string for a host using the DB_CONFIG credentials."""
+        return f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{host}/{DB_CONFIG['database']}"
+        
+    def _read_engine(self, end_date=None):
+        """
+        Returns the engine a read-only query should run on.
+        
+        Args:
+            end_date (datetime, optional): End of the requested date range,
+                used by the replica lag check
+            
+        Returns:
+            sqlalchemy.engine.Engine: A sufficiently fresh replica, or the primary
+        """
+        if self.replicas is None:
+            return self.engine
+        return self.replicas.route(self.engine, end_date)
+        
+    def _timed(self, engine):
+        """Context manager recording query latency for replica routing."""
+        if self.replicas is None:
+            return nullcontext(engine)
+        return self.replicas.timed(engine)
         
     def connect(self):
         """
@@ -93,10 +266,34 @@ class DatabaseConnection:
             with self.engine.connect() as conn:
                 result = conn.execute(text("SELECT 1"))
                 print("Database connection successful!")
-            return self.engine
         except Exception as e:
             print(f"Error connecting to database: {e}")
             return None
+        
+        # Replicas are optional: one that cannot be reached is left out of the pool
+        replica_engines = []
+        for replica_string in self.replica_connection_strings:
+            try:
+                replica_engine = create_engine(replica_string)
+                with replica_engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                replica_engines.append(replica_engine)
+            except Exception as e:
+                print(f"Error connecting to replica, skipping it: {e}")
+        
+        if replica_engines:
+            try:
+                self.replicas = ReplicaPool(
+                    replica_engines,
+                    strategy=self.routing_strategy,
+                    max_lag_seconds=self.max_replica_lag,
+                    lag_check_ttl=REPLICA_CONFIG['lag_check_ttl']
+                )
+                print(f"Routing reads across {len(replica_engines)} replica(s).")
+            except ValueError as e:
+                print(f"Error configuring read replicas, reading from primary: {e}")
+        
+        return self.engine
             
     def get_filtered_data(self, start_date, end_date, min_total_amount, min_orders):
         """
@@ -112,42 +309,16 @@ class DatabaseConnection:
             pd.DataFrame: Filtered customer and order data
         """
         
-        query = """
-        WITH customer_stats AS (
-            SELECT
-                c.customer_id,
-                c.name,
-                COUNT(o.display_order_id) AS order_count,
-                SUM(o.total_amount) AS total_spent
-            FROM customers c
-            LEFT JOIN orders o ON c.customer_id = o.customer_id
-            WHERE o.created_at BETWEEN %s AND %s
-            AND o.created_at IS NOT NULL
-            GROUP BY c.customer_id, c.name
-            HAVING SUM(o.total_amount) >= %s
-                AND COUNT(o.display_order_id) >= %s
-        )
-        SELECT
-            cs.customer_id,
-            cs.name,
-            cs.order_count,
-            cs.total_spent,
-            o.display_order_id,
-            o.created_at,
-            o.total_amount
-        FROM customer_stats cs
-        JOIN orders o ON cs.customer_id = o.customer_id
-        WHERE o.created_at BETWEEN %s AND %s
-        AND o.created_at IS NOT NULL
-        ORDER BY o.created_at DESC
-        """
+        query = FILTERED_DATA_QUERY
         
         try:
-            # Prepare parameters as a tuple
-            params = (
-                start_date, end_date, min_total_amount, min_orders,
-                start_date, end_date
-            )
+            # Named parameters keep the query portable across database drivers
+            params = {
+                "start_date": start_date,
+                "end_date": end_date,
+                "min_total_amount": min_total_amount,
+                "min_orders": min_orders
+            }
             
             # Print debugging info
             print("Executing query with parameters:")
@@ -157,7 +328,9 @@ class DatabaseConnection:
             print(f"  Minimum orders: {min_orders}")
             
             # Execute query with parameterized inputs
-            df = pd.read_sql(query, self.engine, params=params)
+            engine = self._read_engine(end_date)
+            with self._timed(engine):
+                df = pd.read_sql(text(query), engine, params=params)
             
             # Check if data is returned
             if df.empty:
@@ -171,6 +344,38 @@ class DatabaseConnection:
             print(f"Error executing query: {e}")
             return pd.DataFrame()
 
+    def iter_filtered_data(self, start_date, end_date, min_total_amount, min_orders, chunksize=50000):
+        """
+        Streams the result of get_filtered_data in chunks.
+        
+        Rows are fetched through a server-side cursor, so only one chunk is held
+        in memory at a time regardless of the size of the result set.
+        
+        Args:
+            start_date (datetime): Start date for filtering orders
+            end_date (datetime): End date for filtering orders
+            min_total_amount (float): Minimum total amount spent by customer
+            min_orders (int): Minimum number of orders by customer
+            chunksize (int): Number of rows per chunk
+            
+        Yields:
+            pd.DataFrame: Consecutive chunks of filtered customer and order data
+            
+        Raises:
+            Exception: If the query fails; a partial stream cannot be recovered
+        """
+        params = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "min_total_amount": min_total_amount,
+            "min_orders": min_orders
+        }
+        
+        engine = self._read_engine(end_date)
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(text(FILTERED_DATA_QUERY), conn, params=params, chunksize=chunksize):
+                yield chunk
+
 
 
             
@@ -202,11 +407,13 @@ class DatabaseConnection:
             print(f"Start date: {start_date}")
             print(f"End date: {end_date}")
             
-            result = pd.read_sql(
-                query,
-                self.engine,
-                params={"start_date": start_date, "end_date": end_date}
-            )
+            engine = self._read_engine(end_date)
+            with self._timed(engine):
+                result = pd.read_sql(
+                    text(query),
+                    engine,
+                    params={"start_date": start_date, "end_date": end_date}
+                )
             
             # Print results for debugging
             print(f"Summary metrics results:")
@@ -232,7 +439,8 @@ class DatabaseConnection:
             Exception: If database query fails
         """
         try:
-            with self.engine.connect() as conn:
+            engine = self._read_engine()
+            with self._timed(engine), engine.connect() as conn:
                 # Check customers table
                 result = conn.execute(text("SELECT COUNT(*) FROM customers"))
                 customers_count = result.scalar()
@@ -257,4 +465,238 @@ class DatabaseConnection:
         except Exception as e:
             print(f"Error testing data: {e}")
             return 0, 0, None, None
+
+    def get_order_activity(self):
+        """
+        Retrieves the customer id and order date of every dated order.
+        
+        Only the two columns needed for cohort analysis are selected, keeping
+        the transfer small enough to pull the whole table.
         
+        Returns:
+            pd.DataFrame: customer_id and created_at for every order
+        """
+        query = """
+        SELECT customer_id, created_at
+        FROM orders
+        WHERE created_at IS NOT NULL
+        """
+        
+        try:
+            engine = self._read_engine()
+            with self._timed(engine):
+                df = pd.read_sql(text(query), engine)
+            print(f"Order activity fetched: {len(df)} rows.")
+            return df
+        except Exception as e:
+            print(f"Error getting order activity: {e}")
+            return pd.DataFrame(columns=['customer_id', 'created_at'])
+
+    def get_data_version(self):
+        """
+        Returns a cheap fingerprint of the orders table.
+        
+        The fingerprint changes whenever orders are added or removed, so it can
+        key caches of results computed over the whole table.
+        
+        Returns:
+            Tuple[int, str]: Number of orders and latest order date, or (0, None)
+        """
+        try:
+            engine = self._read_engine()
+            with self._timed(engine), engine.connect() as conn:
+                orders_count, latest = conn.execute(text(
+                    "SELECT COUNT(*), MAX(created_at) FROM orders"
+                )).first()
+            return orders_count, str(latest) if latest is not None else None
+        except Exception as e:
+            print(f"Error getting data version: {e}")
+            return 0, None
+
+    def has_negative_amounts(self, start_date, end_date):
+        """
+        Checks whether any order in a date range has a negative amount.
+        
+        Refunds are stored as negative orders; with them, dropping orders from
+        a date range can raise a customer's total spent.
+        
+        Args:
+            start_date (datetime): Start date of the range
+            end_date (datetime): End date of the range
+            
+        Returns:
+            bool: True if the range has a negative amount, or if the check failed
+        """
+        query = text("""
+        SELECT 1 FROM orders
+        WHERE created_at BETWEEN :start_date AND :end_date
+        AND total_amount < 0
+        LIMIT 1
+        """)
+        try:
+            engine = self._read_engine(end_date)
+            with self._timed(engine), engine.connect() as conn:
+                found = conn.execute(query, {"start_date": start_date, "end_date": end_date}).first()
+            return found is not None
+        except Exception as e:
+            print(f"Error checking for negative amounts: {e}")
+            return True
+
+    def iter_customer_features(self, since=None, chunksize=50000):
+        """
+        Yields per-customer order count, total spent and latest order date.
+        
+        Customers are paged by customer_id (keyset pagination) with one short
+        query per chunk, so no cursor stays open while a caller writes results
+        back between chunks.
+        
+        Pages are read from the primary, like the scoring watermark: a lagging
+        replica could miss orders at or before the watermark, and those
+        customers would never be rescored.
+        
+        Args:
+            since (datetime, optional): Only customers with an order after this
+                date, i.e. customers whose features changed since a previous run
+            chunksize (int): Number of customers per chunk
+            
+        Yields:
+            pd.DataFrame: customer_id, order_count, total_spent, last_order_at
+        """
+        having = "HAVING MAX(created_at) > :since" if since is not None else ""
+        query = text(CUSTOMER_FEATURES_QUERY.format(having=having))
+        params = {"after": -1, "limit": chunksize}
+        if since is not None:
+            params["since"] = since
+        
+        while True:
+            chunk = pd.read_sql(query, self.engine, params=params)
+            if chunk.empty:
+                return
+            chunk['last_order_at'] = pd.to_datetime(chunk['last_order_at'])
+            yield chunk
+            if len(chunk) < chunksize:
+                return
+            params["after"] = int(chunk['customer_id'].iloc[-1])
+
+    def write_customer_scores(self, scores):
+        """
+        Upserts model scores into the customer_scores table on the primary.
+        
+        Existing rows for the same customers are replaced within one
+        transaction, using bulk deletes and one bulk insert so the upsert
+        works on any backend.
+        
+        Args:
+            scores (pd.DataFrame): Rows matching the customer_scores columns
+            
+        Returns:
+            int: Number of rows written
+        """
+        if scores.empty:
+            return 0
+        
+        # Column-wise conversion to Python values every driver accepts; much
+        # cheaper than boxing row by row with to_dict('records')
+        names = list(scores.columns)
+        columns = [scores[name].to_numpy(dtype=object, na_value=None).tolist() for name in names]
+        records = [dict(zip(names, row)) for row in zip(*columns)]
+        customer_ids = columns[names.index('customer_id')]
+        
+        metadata.create_all(self.engine, tables=[customer_scores], checkfirst=True)
+        with self.engine.begin() as conn:
+            for i in range(0, len(customer_ids), IN_LIST_SIZE):
+                conn.execute(customer_scores.delete().where(
+                    customer_scores.c.customer_id.in_(customer_ids[i:i + IN_LIST_SIZE])
+                ))
+            conn.execute(customer_scores.insert(), records)
+        return len(records)
+
+    def get_order_watermark(self):
+        """
+        Returns the latest order date on the primary.
+        
+        Captured when a scoring run starts: every order up to it is visible to
+        the run, so it is safe to resume from once the whole run has finished.
+        
+        Returns:
+            datetime: MAX(created_at) of the orders table, or None if it is empty
+        """
+        with self.engine.connect() as conn:
+            latest = conn.execute(text("SELECT MAX(created_at) FROM orders")).scalar()
+        return pd.Timestamp(latest).to_pydatetime() if latest is not None else None
+
+    def get_scoring_watermark(self, model_version):
+        """
+        Returns the order watermark of a model version's last completed scoring run.
+        
+        Read from the primary, where runs are recorded, so an incremental run
+        never starts from a lagging replica's view.
+        
+        Args:
+            model_version (str): Model version to look up
+            
+        Returns:
+            datetime: Watermark recorded by the last completed run, or None
+        """
+        try:
+            with self.engine.connect() as conn:
+                return conn.execute(
+                    select(scoring_runs.c.watermark)
+                    .where(scoring_runs.c.model_version == model_version)
+                ).scalar()
+        except Exception as e:
+            # Typically the table does not exist yet
+            print(f"Error getting scoring watermark: {e}")
+            return None
+
+    def record_scoring_run(self, model_version, watermark):
+        """
+        Records a completed scoring run on the primary.
+        
+        Only called after every page has been written, so an interrupted run
+        leaves the previous watermark in place and the next run redoes its work.
+        
+        Args:
+            model_version (str): Model version that scored the run
+            watermark (datetime): Order watermark captured when the run started
+        """
+        metadata.create_all(self.engine, tables=[scoring_runs], checkfirst=True)
+        with self.engine.begin() as conn:
+            conn.execute(scoring_runs.delete().where(scoring_runs.c.model_version == model_version))
+            conn.execute(scoring_runs.insert(), {
+                'model_version': model_version,
+                'watermark': watermark,
+                'completed_at': datetime.now().replace(microsecond=0)
+            })
+
+    def get_customer_scores(self, customer_ids=None):
+        """
+        Looks up stored model scores.
+        
+        Args:
+            customer_ids (list, optional): Customers to look up; all when omitted
+            
+        Returns:
+            pd.DataFrame: customer_scores rows, empty if none are stored
+        """
+        query = select(customer_scores)
+        try:
+            engine = self._read_engine()
+            with self._timed(engine), engine.connect() as conn:
+                if customer_ids is None:
+                    return pd.read_sql(query, conn)
+                
+                customer_ids = [int(customer_id) for customer_id in customer_ids]
+                frames = [
+                    pd.read_sql(
+                        query.where(customer_scores.c.customer_id.in_(customer_ids[i:i + IN_LIST_SIZE])),
+                        conn
+                    )
+                    for i in range(0, len(customer_ids), IN_LIST_SIZE)
+                ]
+            if not frames:
+                return pd.DataFrame(columns=[column.name for column in customer_scores.columns])
+            return pd.concat(frames, ignore_index=True)
+        except Exception as e:
+            print(f"Error getting customer scores: {e}")
+            return pd.DataFrame(columns=[column.name for column in customer_scores.columns])
@@ -0,0 +1,217 @@
+"""
+export_utils.py: Filtered Orders Export
+
+This module streams the filtered customer and order data to CSV or Parquet
+files chunk by chunk, so an export never materializes the full result set in
+memory.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Functions:
+    export_filtered_data(db_connection, output, start_date, end_date, min_total_amount,
+                         min_orders, file_format, compression, chunksize) -> int
+        Streams filtered data to a CSV or Parquet file and returns the row count
+    export_file_name(file_format, compression) -> str
+        Builds a download file name for an export
+    normalize_chunk(chunk) -> pd.DataFrame
+        Coerces a chunk of filtered data to the export schema
+
+Dependencies:
+    - pandas
+    - pyarrow (Parquet exports only)
+"""
+
+import bz2
+import gzip
+import io
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from config.config import EXPORT_CONFIG
+
+# Supported compression codecs per export format
+EXPORT_FORMATS = {
+    'csv': (None, 'gzip', 'bz2'),
+    'parquet': (None, 'snappy', 'gzip', 'zstd')
+}
+
+CSV_EXTENSIONS = {None: '', 'gzip': '.gz', 'bz2': '.bz2'}
+
+# Export dtype of each get_filtered_data column; display_order_id is an order
+# code such as 'YTFA', and order_count stays an integer in CSV output
+EXPORT_SCHEMA = {
+    'customer_id': 'int64',
+    'name': 'string',
+    'order_count': 'Int64',
+    'total_spent': 'float64',
+    'display_order_id': 'string',
+    'created_at': 'datetime64[ns]',
+    'total_amount': 'float64'
+}
+
+EXPORT_COLUMNS = list(EXPORT_SCHEMA)
+
+
+def export_file_name(file_format, compression=None):
+    """
+    Builds a unique, timestamped file name for an export.
+
+    A random suffix keeps exports started in the same second by different
+    sessions from overwriting each other.
+
+    Args:
+        file_format (str): 'csv' or 'parquet'
+        compression (str, optional): Compression codec
+
+    Returns:
+        str: File name such as 'filtered_orders_20241020_101500_3f2a9c1e.csv.gz'
+    """
+    name = f"filtered_orders_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}.{file_format}"
+    if file_format == 'csv':
+        name += CSV_EXTENSIONS[compression]
+    return name
+
+
+def normalize_chunk(chunk):
+    """
+    Coerces column types so every chunk of an export shares the same schema.
+
+    Args:
+        chunk (pd.DataFrame): Chunk returned by the database
+
+    Returns:
+        pd.DataFrame: Chunk with the EXPORT_SCHEMA dtypes
+    """
+    chunk = chunk.copy()
+    for column, dtype in EXPORT_SCHEMA.items():
+        if dtype == 'string':
+            chunk[column] = chunk[column].astype('string')
+        elif dtype.startswith('datetime'):
+            chunk[column] = pd.to_datetime(chunk[column], errors='coerce').astype(dtype)
+        else:
+            chunk[column] = pd.to_numeric(chunk[column], errors='coerce').astype(dtype)
+    return chunk
+
+
+def _with_header(chunks):
+    """Yields the chunks, or one empty chunk so an empty export still gets its header."""
+    empty = True
+    for chunk in chunks:
+        empty = False
+        yield chunk
+    if empty:
+        yield pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in EXPORT_SCHEMA.items()})
+
+
+def _open_output(output, mode='wb'):
+    """Returns a binary file object for a path or an already open binary stream."""
+    if isinstance(output, (str, os.PathLike)):
+        return open(output, mode), True
+    return output, False
+
+
+def _write_csv(chunks, stream, compression):
+    """Writes chunks to a binary stream as CSV, compressing on the fly."""
+    if compression == 'gzip':
+        compressed = gzip.GzipFile(fileobj=stream, mode='wb')
+    elif compression == 'bz2':
+        compressed = bz2.BZ2File(stream, mode='wb')
+    else:
+        compressed = None
+
+    text_stream = io.TextIOWrapper(compressed or stream, encoding='utf-8', newline='')
+    rows = 0
+    try:
+        for position, chunk in enumerate(chunks):
+            chunk.to_csv(text_stream, header=position == 0, index=False)
+            rows += len(chunk)
+        text_stream.flush()
+    finally:
+        # Detach so closing the wrapper does not close a caller-owned stream
+        text_stream.detach()
+        if compressed is not None:
+            compressed.close()
+    return rows
+
+
+def _write_parquet(chunks, stream, compression):
+    """Writes chunks to a binary stream as Parquet, one row group per chunk."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(stream, table.schema, compression=compression or 'none')
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_filtered_data(db_connection, output, start_date, end_date, min_total_amount,
+                         min_orders, file_format='csv', compression=None, chunksize=None):
+    """
+    Streams filtered customer and order data to a CSV or Parquet file.
+
+    Rows are read from a server-side cursor and written chunk by chunk, so
+    memory use is bounded by the chunk size rather than the result size.
+
+    Args:
+        db_connection (DatabaseConnection): Connected database wrapper
+        output (str or file object): Destination path or writable binary stream
+        start_date (datetime): Start date for filtering orders
+        end_date (datetime): End date for filtering orders
+        min_total_amount (float): Minimum total amount spent by customer
+        min_orders (int): Minimum number of orders by customer
+        file_format (str): 'csv' or 'parquet'
+        compression (str, optional): Codec from EXPORT_FORMATS[file_format]
+        chunksize (int, optional): Rows per chunk, defaults to EXPORT_CONFIG['chunksize']
+
+    Returns:
+        int: Number of rows exported
+
+    Raises:
+        ValueError: If the format or compression codec is not supported
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    if compression not in EXPORT_FORMATS[file_format]:
+        raise ValueError(f"Unsupported compression for {file_format}: {compression}")
+
+    chunks = _with_header(
+        normalize_chunk(chunk)
+        for chunk in db_connection.iter_filtered_data(
+            start_date, end_date, min_total_amount, min_orders,
+            chunksize=chunksize or EXPORT_CONFIG['chunksize']
+        )
+    )
+
+    stream, owned = _open_output(output)
+    try:
+        if file_format == 'csv':
+            rows = _write_csv(chunks, stream, compression)
+        else:
+            rows = _write_parquet(chunks, stream, compression)
+    finally:
+        if owned:
+            stream.close()
+
+    print(f"Exported {rows} rows as {file_format}" + (f" ({compression})" if compression else ""))
+    return rows
@@ -0,0 +1,231 @@
+"""
+filter_cache.py: Filter-Subsumption Session Cache
+
+This module keeps the most recent get_filtered_data result of a dashboard
+session and answers narrower filters from it in memory. A filter is narrower
+("subsumed") when its date range lies inside the cached range and both of its
+thresholds are at least the cached ones: every customer that qualifies for it
+also qualified for the cached filter, and all of that customer's orders in the
+narrower range are already in the cached rows.
+
+For a narrower date range the per-customer order count and total spent are
+recomputed over the remaining rows with two np.bincount passes, and the HAVING
+thresholds are re-applied; for the same date range the cached per-customer
+stats are reused as they are. The database is only queried when a filter
+widens, or when the cached result is older than FILTER_CACHE_CONFIG['ttl'].
+
+The stored scores of the cached customers and the orders table data version
+are looked up once per cached result and kept with it, so a rerun answered
+from memory does not touch the database at all.
+
+A narrower date range is only answered from memory when the cached range has
+no negative order amounts (refunds). Dropping a refund from the range can
+raise a customer's total spent above the threshold, and such a customer is
+missing from the cached rows. Whether the cached range has refunds is looked
+up once per cached result with has_negative_amounts.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Classes:
+    FilteredDataCache
+        Drop-in get_filtered_data that serves subsumed filters from memory,
+        with per-result customer scores and data version
+
+Dependencies:
+    - numpy
+    - pandas
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from config.config import FILTER_CACHE_CONFIG
+
+# Sums are recomputed in floating point while the database sums decimals
+AMOUNT_TOLERANCE = 1e-6
+
+
+class FilteredDataCache:
+    """
+    Per-session cache of the widest recent filtered result.
+
+    Attributes:
+        db_connection (DatabaseConnection): Source of filtered data on a miss
+        ttl (int): Seconds a cached result may serve narrower filters
+        max_rows (int): Largest result kept in memory
+        hits (int): Filters answered from memory
+        misses (int): Filters sent to the database
+
+    Methods:
+        get_filtered_data(start_date, end_date, min_total_amount, min_orders) -> pd.DataFrame:
+            Same contract as DatabaseConnection.get_filtered_data
+        get_customer_scores(customer_ids) -> pd.DataFrame:
+            Same contract as DatabaseConnection.get_customer_scores
+        get_data_version() -> Tuple[int, str]:
+            Same contract as DatabaseConnection.get_data_version
+    """
+
+    def __init__(self, db_connection, ttl=None, max_rows=None):
+        """
+        Initializes an empty cache.
+
+        Args:
+            db_connection (DatabaseConnection): Source of filtered data
+            ttl (int, optional): Defaults to FILTER_CACHE_CONFIG['ttl']
+            max_rows (int, optional): Defaults to FILTER_CACHE_CONFIG['max_rows']
+        """
+        self.db_connection = db_connection
+        self.ttl = FILTER_CACHE_CONFIG['ttl'] if ttl is None else ttl
+        self.max_rows = FILTER_CACHE_CONFIG['max_rows'] if max_rows is None else max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entry = None
+
+    def _fresh_entry(self):
+        """Returns the cached result while it is younger than the TTL, else None."""
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry['fetched_at'] < self.ttl:
+            return entry
+        return None
+
+    def _covers(self, start, end, min_total_amount, min_orders):
+        """Checks whether the cached result contains the answer to a filter."""
+        entry = self._fresh_entry()
+        if not (
+            entry is not None
+            and entry['start'] <= start
+            and end <= entry['end']
+            and entry['min_total_amount'] <= min_total_amount
+            and entry['min_orders'] <= min_orders
+        ):
+            return False
+        if start == entry['start'] and end == entry['end']:
+            return True
+
+        # Customers excluded by the cached filter may qualify once a refund
+        # falls outside the narrower range
+        if 'negative_amounts' not in entry:
+            entry['negative_amounts'] = self.db_connection.has_negative_amounts(
+                entry['start'].to_pydatetime(), entry['end'].to_pydatetime()
+            )
+        return not entry['negative_amounts']
+
+    def _store(self, df, start, end, min_total_amount, min_orders):
+        """Caches a fetched result with the arrays needed to re-filter it."""
+        codes, customers = pd.factorize(df['customer_id'])
+        self._entry = {
+            'data': df,
+            'start': start,
+            'end': end,
+            'min_total_amount': min_total_amount,
+            'min_orders': min_orders,
+            'fetched_at': time.monotonic(),
+            'codes': codes,
+            'customers': customers,
+            'n_customers': len(customers),
+            'created_at': pd.to_datetime(df['created_at']).to_numpy(),
+            # SQL SUM skips NULL amounts; NaN weights would drop the whole customer
+            'amounts': np.nan_to_num(pd.to_numeric(df['total_amount']).to_numpy(dtype=np.float64)),
+            'has_order_id': df['display_order_id'].notna().to_numpy(dtype=np.float64),
+            'order_count': pd.to_numeric(df['order_count']).to_numpy(dtype=np.float64),
+            'total_spent': pd.to_numeric(df['total_spent']).to_numpy(dtype=np.float64)
+        }
+
+    def _subset(self, start, end, min_total_amount, min_orders):
+        """Answers a subsumed filter from the cached result."""
+        entry = self._entry
+        df = entry['data']
+        amount_floor = min_total_amount - AMOUNT_TOLERANCE
+
+        if start == entry['start'] and end == entry['end']:
+            # Same orders per customer: the cached stats still hold
+            keep = (entry['total_spent'] >= amount_floor) & (entry['order_count'] >= min_orders)
+            return df[keep].reset_index(drop=True)
+
+        # Same bounds as the SQL BETWEEN on created_at
+        in_range = (entry['created_at'] >= start.to_datetime64()) & (entry['created_at'] <= end.to_datetime64())
+        codes = entry['codes'][in_range]
+        order_count = np.bincount(codes, weights=entry['has_order_id'][in_range], minlength=entry['n_customers'])
+        total_spent = np.bincount(codes, weights=entry['amounts'][in_range], minlength=entry['n_customers'])
+
+        qualifies = (total_spent >= amount_floor) & (order_count >= min_orders)
+        keep = in_range & qualifies[entry['codes']]
+        kept_codes = entry['codes'][keep]
+
+        result = df[keep].reset_index(drop=True)
+        result['order_count'] = order_count[kept_codes].astype(np.int64)
+        result['total_spent'] = total_spent[kept_codes]
+        return result
+
+    def get_filtered_data(self, start_date, end_date, min_total_amount, min_orders):
+        """
+        Retrieves filtered customer and order data, from memory when possible.
+
+        Args:
+            start_date (datetime): Start date for filtering orders
+            end_date (datetime): End date for filtering orders
+            min_total_amount (float): Minimum total amount spent by customer
+            min_orders (int): Minimum number of orders by customer
+
+        Returns:
+            pd.DataFrame: Filtered customer and order data
+        """
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        if self._covers(start, end, min_total_amount, min_orders):
+            self.hits += 1
+            return self._subset(start, end, min_total_amount, min_orders)
+
+        self.misses += 1
+        df = self.db_connection.get_filtered_data(start_date, end_date, min_total_amount, min_orders)
+        # Empty results are not cached: get_filtered_data also returns one on errors
+        if not df.empty and len(df) <= self.max_rows:
+            self._store(df, start, end, min_total_amount, min_orders)
+        return df
+
+    def get_customer_scores(self, customer_ids):
+        """
+        Looks up stored model scores, from memory for customers of the cached result.
+
+        The scores of every customer in the cached result are fetched on first
+        use, so narrower filters answered from memory reuse them.
+
+        Args:
+            customer_ids (list): Customers to look up
+
+        Returns:
+            pd.DataFrame: customer_scores rows, empty if none are stored
+        """
+        entry = self._fresh_entry()
+        customer_ids = pd.unique(np.asarray(customer_ids))
+        if entry is None or not np.isin(customer_ids, entry['customers']).all():
+            return self.db_connection.get_customer_scores(customer_ids)
+
+        if 'scores' not in entry:
+            scores = self.db_connection.get_customer_scores(entry['customers'])
+            # Empty lookups are not kept: get_customer_scores also returns one on errors
+            if scores.empty:
+                return scores
+            entry['scores'] = scores
+        scores = entry['scores']
+        return scores[scores['customer_id'].isin(customer_ids)].reset_index(drop=True)
+
+    def get_data_version(self):
+        """
+        Returns the orders table data version, looked up once per cached result.
+
+        Returns:
+            Tuple[int, str]: Number of orders and latest order date, or (0, None)
+        """
+        entry = self._fresh_entry()
+        if entry is None:
+            return self.db_connection.get_data_version()
+        if 'data_version' not in entry:
+            entry['data_version'] = self.db_connection.get_data_version()
+        return entry['data_version']
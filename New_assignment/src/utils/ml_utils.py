@@ -4,6 +4,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report
+import hashlib
+import joblib
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -15,6 +17,7 @@ class CustomerPredictor:
         self.model = LogisticRegression()
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.model_version = None
         
     def prepare_data(self, df):
         # Create features
@@ -55,15 +58,52 @@ class CustomerPredictor:
         accuracy = accuracy_score(y_test, y_pred)
         
         self.is_trained = True
+        self.model_version = self._fingerprint()
         return True, f"Model trained successfully with accuracy: {accuracy:.2f}"
         
-    def predict(self, orders, total_amount):
+    def save(self, path):
+        # Persist the fitted parameters so later runs keep the same model_version
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        joblib.dump({'scaler': self.scaler, 'model': self.model}, path)
+        
+    @classmethod
+    def load(cls, path):
+        predictor = cls()
+        state = joblib.load(path)
+        predictor.scaler = state['scaler']
+        predictor.model = state['model']
+        predictor.is_trained = True
+        predictor.model_version = predictor._fingerprint()
+        return predictor
+        
+    def _fingerprint(self):
+        # Same training data gives the same parameters and therefore the same version
+        digest = hashlib.sha1()
+        for array in (self.scaler.mean_, self.scaler.scale_, self.model.coef_, self.model.intercept_):
+            digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+        return digest.hexdigest()[:12]
+        
+    def predict_batch(self, orders, total_amount):
         if not self.is_trained:
             return None, "Model not trained yet"
-            
-        features = np.array([[orders, total_amount]])
+        
+        # One transform and one predict_proba for the whole batch; the class
+        # with the highest probability is what predict() would return
+        features = np.column_stack([
+            np.asarray(orders, dtype=np.float64),
+            np.asarray(total_amount, dtype=np.float64)
+        ])
         features_scaled = self.scaler.transform(features)
-        prediction = self.model.predict(features_scaled)
-        probability = self.model.predict_proba(features_scaled)[0]
+        probabilities = self.model.predict_proba(features_scaled)
+        predictions = self.model.classes_[probabilities.argmax(axis=1)]
+        
+        return predictions, probabilities
+        
+    def predict(self, orders, total_amount):
+        if not self.is_trained:
+            return None, "Model not trained yet"
+        
+        predictions, probabilities = self.predict_batch([orders], [total_amount])
         
-        return prediction[0], probability
\ No newline at end of file
+        return predictions[0], probabilities[0]
\ No newline at end of file
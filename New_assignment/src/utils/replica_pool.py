@@ -0,0 +1,226 @@
+"""
+replica_pool.py: Read-Replica Routing
+
+This module keeps a pool of read-replica engines and decides which engine a
+read-only query should run on. Writes and ingest always stay on the primary;
+reads are spread across the replicas, either round-robin or by lowest observed
+latency, and fall back to the primary only when no replica has caught up with
+the date range being requested.
+
+Latency-based routing compares two randomly sampled replicas ("power of two
+choices") rather than always taking the global minimum, and re-probes any
+replica that has gone PROBE_INTERVAL seconds without a latency sample, so one
+slow query does not take a replica out of rotation for good.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Classes:
+    ReplicaPool
+        Selects a replica engine for reads and tracks replica lag and latency
+
+Dependencies:
+    - pandas
+    - sqlalchemy
+"""
+
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import text
+
+ROUTING_STRATEGIES = ('round_robin', 'least_latency')
+
+
+class ReplicaPool:
+    """
+    A pool of read-replica engines with lag-aware routing.
+
+    Replica freshness is measured by the replica's high-water mark, i.e. the
+    latest ``orders.created_at`` it holds. A replica may serve a read when its
+    high-water mark is within ``max_lag_seconds`` of the primary's, or when the
+    requested date range ends at or before its high-water mark.
+    High-water marks are cached for ``lag_check_ttl`` seconds so the lag check
+    does not double the number of queries.
+
+    Attributes:
+        engines (list): Replica engines available for reads
+        strategy (str): 'round_robin' or 'least_latency'
+        max_lag_seconds (int): Maximum tolerated replica lag in seconds
+        lag_check_ttl (int): Seconds a cached high-water mark stays valid
+
+    Methods:
+        route(primary, end_date=None) -> sqlalchemy.engine.Engine:
+            Picks the engine a read for the given date range should use
+        timed(engine):
+            Context manager recording the latency of a query on an engine
+    """
+
+    # Weight of the newest sample in the latency moving average
+    LATENCY_SMOOTHING = 0.2
+    # Seconds without a latency sample after which a replica is probed again
+    PROBE_INTERVAL = 10.0
+
+    def __init__(self, engines, strategy='round_robin', max_lag_seconds=300, lag_check_ttl=30):
+        """
+        Initializes the pool.
+
+        Args:
+            engines (list): Replica engines
+            strategy (str): Routing strategy, one of ROUTING_STRATEGIES
+            max_lag_seconds (int): Maximum tolerated replica lag in seconds
+            lag_check_ttl (int): Seconds a cached high-water mark stays valid
+
+        Raises:
+            ValueError: If the routing strategy is unknown
+        """
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+
+        self.engines = list(engines)
+        self.strategy = strategy
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_ttl = lag_check_ttl
+
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._latencies = {id(engine): 0.0 for engine in self.engines}
+        self._sampled_at = {id(engine): time.monotonic() for engine in self.engines}
+        self._watermarks = {}
+
+    def _next_engine(self):
+        """Returns the next replica according to the routing strategy."""
+        with self._lock:
+            if self.strategy == 'least_latency':
+                return self._least_latency_engine()
+            return self.engines[next(self._counter) % len(self.engines)]
+
+    def _least_latency_engine(self):
+        """Re-probes the longest unsampled replica, else the faster of two random ones."""
+        now = time.monotonic()
+        due = [engine for engine in self.engines if now - self._sampled_at[id(engine)] >= self.PROBE_INTERVAL]
+        if due:
+            engine = min(due, key=lambda engine: self._sampled_at[id(engine)])
+            # Claim the probe so concurrent reads do not all pile onto it
+            self._sampled_at[id(engine)] = now
+            return engine
+        candidates = random.sample(self.engines, min(2, len(self.engines)))
+        return min(candidates, key=lambda engine: self._latencies[id(engine)])
+
+    def record_latency(self, engine, seconds):
+        """
+        Folds a query duration into the engine's latency moving average.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): Engine the query ran on
+            seconds (float): Query duration in seconds
+        """
+        key = id(engine)
+        with self._lock:
+            if key not in self._latencies:
+                return
+            self._sampled_at[key] = time.monotonic()
+            previous = self._latencies[key]
+            if previous == 0.0:
+                self._latencies[key] = seconds
+            else:
+                self._latencies[key] = (
+                    self.LATENCY_SMOOTHING * seconds + (1 - self.LATENCY_SMOOTHING) * previous
+                )
+
+    @contextmanager
+    def timed(self, engine):
+        """
+        Records how long the wrapped block takes on the given engine.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): Engine the query runs on
+        """
+        started = time.perf_counter()
+        try:
+            yield engine
+        finally:
+            self.record_latency(engine, time.perf_counter() - started)
+
+    def watermark(self, engine):
+        """
+        Returns the latest order timestamp held by an engine, cached for lag_check_ttl.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): Engine to inspect
+
+        Returns:
+            pd.Timestamp: Latest created_at, or None if the table is empty
+        """
+        now = time.monotonic()
+        key = id(engine)
+        cached = self._watermarks.get(key)
+        if cached is not None and now - cached[0] < self.lag_check_ttl:
+            return cached[1]
+
+        with engine.connect() as conn:
+            latest = conn.execute(text(
+                "SELECT MAX(created_at) FROM orders WHERE created_at IS NOT NULL"
+            )).scalar()
+        latest = pd.Timestamp(latest) if latest is not None else None
+        self._watermarks[key] = (now, latest)
+        return latest
+
+    def is_fresh(self, engine, primary, end_date=None):
+        """
+        Checks whether a replica is recent enough to answer a read.
+
+        Args:
+            engine (sqlalchemy.engine.Engine): Replica engine
+            primary (sqlalchemy.engine.Engine): Primary engine
+            end_date (datetime, optional): End of the requested date range;
+                None means the read needs the full table
+
+        Returns:
+            bool: True if the replica's lag is acceptable for the range
+        """
+        primary_mark = self.watermark(primary)
+        replica_mark = self.watermark(engine)
+        if primary_mark is None:
+            return True
+        if replica_mark is None:
+            return False
+
+        # Within the lag budget the replica may serve any range
+        if (primary_mark - replica_mark).total_seconds() <= self.max_lag_seconds:
+            return True
+        # Otherwise only ranges the replica has fully caught up with
+        return end_date is not None and pd.Timestamp(end_date) <= replica_mark
+
+    def route(self, primary, end_date=None):
+        """
+        Picks the engine a read-only query should run on.
+
+        The replica chosen by the routing strategy is tried first, then the
+        other replicas in pool order; the primary only serves the read when
+        none of them is fresh enough.
+
+        Args:
+            primary (sqlalchemy.engine.Engine): Primary engine used as fallback
+            end_date (datetime, optional): End of the requested date range
+
+        Returns:
+            sqlalchemy.engine.Engine: A fresh replica, or the primary
+        """
+        if not self.engines:
+            return primary
+
+        first = self._next_engine()
+        start = self.engines.index(first)
+        for replica in self.engines[start:] + self.engines[:start]:
+            try:
+                if self.is_fresh(replica, primary, end_date):
+                    return replica
+            except Exception as e:
+                print(f"Replica lag check failed: {e}")
+        print("No replica fresh enough for requested range, falling back to primary.")
+        return primary
@@ -0,0 +1,170 @@
+"""
+scoring_utils.py: Batch Customer Scoring Job
+
+This module scores every customer with the repeat-purchase model in one batch
+and stores the results in the customer_scores table, so the dashboard can read
+scores instead of running inference per customer.
+
+Customer features are read in keyset-paginated chunks; each chunk goes
+through a single scaler transform and a single predict_proba call, and is
+written back with one bulk statement.
+
+The trained model is persisted to MODEL_PATH and reused by later runs, so its
+model_version only changes when the job is run with --retrain. Each completed
+run records the primary's latest order date as captured when the run started;
+incremental runs only rescore customers with orders after that watermark, and
+a model version without a completed run rescores everyone.
+
+Author: Hansamalee Ekanayake
+Date: October 2024
+
+Functions:
+    train_predictor(db_connection) -> Tuple[CustomerPredictor, str]
+        Trains the repeat-purchase model on the full order history
+    load_predictor(db_connection, model_path, retrain) -> Tuple[CustomerPredictor, str]
+        Loads the persisted model, training and saving a new one when needed
+    score_customers(db_connection, predictor, full, chunksize) -> int
+        Scores customers and writes the results to customer_scores
+
+Dependencies:
+    - pandas
+    - scikit-learn
+    - joblib
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from config.config import MODEL_PATH, SCORING_CONFIG
+from src.utils.database_utils import DatabaseConnection
+from src.utils.ml_utils import CustomerPredictor
+
+
+def train_predictor(db_connection):
+    """
+    Trains the repeat-purchase model on every dated order.
+
+    Args:
+        db_connection (DatabaseConnection): Connected database wrapper
+
+    Returns:
+        Tuple[CustomerPredictor, str]: The predictor (untrained on failure) and
+                                       the training message
+    """
+    predictor = CustomerPredictor()
+    _, _, min_date, max_date = db_connection.test_data_exists()
+    if min_date is None:
+        return predictor, "No order data available for training"
+
+    training_data = db_connection.get_filtered_data(min_date, max_date, 0, 0)
+    _, message = predictor.train(training_data)
+    return predictor, message
+
+
+def load_predictor(db_connection, model_path=None, retrain=False):
+    """
+    Loads the persisted model, or trains and persists a new one.
+
+    Args:
+        db_connection (DatabaseConnection): Connected database wrapper
+        model_path (str, optional): Model file, defaults to MODEL_PATH
+        retrain (bool): Train a new model even if one is persisted
+
+    Returns:
+        Tuple[CustomerPredictor, str]: The predictor (untrained on failure) and
+                                       a status message
+    """
+    model_path = model_path or MODEL_PATH
+    if not retrain and os.path.exists(model_path):
+        predictor = CustomerPredictor.load(model_path)
+        return predictor, f"Loaded model {predictor.model_version} from {model_path}"
+
+    predictor, message = train_predictor(db_connection)
+    if predictor.is_trained:
+        predictor.save(model_path)
+        message += f"; saved model {predictor.model_version} to {model_path}"
+    return predictor, message
+
+
+def score_customers(db_connection, predictor, full=False, chunksize=None):
+    """
+    Scores customers in vectorized chunks and upserts them into customer_scores.
+
+    The run is recorded in scoring_runs only after every chunk is written, so
+    an interrupted run is redone from the previous watermark.
+
+    Args:
+        db_connection (DatabaseConnection): Connected database wrapper
+        predictor (CustomerPredictor): Trained predictor
+        full (bool): Rescore every customer instead of only changed ones
+        chunksize (int, optional): Customers per chunk, defaults to SCORING_CONFIG['chunksize']
+
+    Returns:
+        int: Number of customers scored
+
+    Raises:
+        ValueError: If the predictor is not trained
+    """
+    if not predictor.is_trained:
+        raise ValueError("Predictor must be trained before scoring")
+
+    # Orders committed after this point are picked up by the next run
+    watermark = db_connection.get_order_watermark()
+    since = None if full else db_connection.get_scoring_watermark(predictor.model_version)
+    print(f"Scoring customers with model {predictor.model_version}"
+          + (f" with orders after {since}" if since is not None else " (full run)"))
+
+    scored_at = datetime.now().replace(microsecond=0)
+    scored = 0
+    for features in db_connection.iter_customer_features(
+        since=since, chunksize=chunksize or SCORING_CONFIG['chunksize']
+    ):
+        predictions, probabilities = predictor.predict_batch(
+            features['order_count'], features['total_spent']
+        )
+        repeat_column = list(predictor.model.classes_).index(1)
+
+        scores = pd.DataFrame({
+            'customer_id': features['customer_id'],
+            'order_count': features['order_count'],
+            'total_spent': features['total_spent'].astype(float),
+            'last_order_at': features['last_order_at'],
+            'is_repeat_prediction': predictions.astype(int),
+            'repeat_probability': probabilities[:, repeat_column],
+            'model_version': predictor.model_version,
+            'scored_at': scored_at
+        })
+        scored += db_connection.write_customer_scores(scores)
+        print(f"Scored {scored} customers")
+
+    if watermark is not None:
+        db_connection.record_scoring_run(predictor.model_version, watermark)
+    return scored
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score customers into the customer_scores table.")
+    parser.add_argument('--full', action='store_true', help="rescore every customer")
+    parser.add_argument('--retrain', action='store_true',
+                        help="train and persist a new model instead of loading the saved one")
+    args = parser.parse_args()
+
+    db_connection = DatabaseConnection()
+    if db_connection.connect() is None:
+        print("Scoring not run: database connection failed.")
+        return
+
+    predictor, message = load_predictor(db_connection, retrain=args.retrain)
+    print(message)
+    if not predictor.is_trained:
+        return
+    score_customers(db_connection, predictor, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.utils.database_utils import DatabaseConnection
+from src.utils.ml_utils import CustomerPredictor
+
+ORDERS = [
+    (1, 1, '2024-01-05 10:00:00', 100.0),
+    (2, 1, '2024-02-10 10:00:00', 50.0),
+    (3, 2, '2024-02-15 10:00:00', 20.0),
+    (4, 3, '2024-03-20 10:00:00', 300.0),
+]
+
+
+def create_orders_db(path, orders):
+    """Creates a SQLite database with the customers and orders tables."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (customer_id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE orders (display_order_id INTEGER PRIMARY KEY, customer_id INTEGER, "
+            "created_at TEXT, total_amount REAL)"
+        ))
+        conn.execute(
+            text("INSERT INTO customers VALUES (:id, :name)"),
+            [{"id": i, "name": f"Customer {i}"} for i in sorted({o[1] for o in orders})]
+        )
+        conn.execute(
+            text("INSERT INTO orders VALUES (:id, :customer_id, :created_at, :amount)"),
+            [
+                {"id": o[0], "customer_id": o[1], "created_at": o[2], "amount": o[3]}
+                for o in orders
+            ]
+        )
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+def make_orders(n_customers=80, seed=0):
+    """Orders for customers with one to five orders each."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    order_id = 0
+    for customer_id in range(n_customers):
+        for _ in range(rng.integers(1, 6)):
+            order_id += 1
+            rows.append((customer_id, order_id, float(rng.uniform(5, 200))))
+    return pd.DataFrame(rows, columns=['customer_id', 'display_order_id', 'total_amount'])
+
+
+def trained_predictor():
+    predictor = CustomerPredictor()
+    success, message = predictor.train(make_orders())
+    assert success, message
+    return predictor
+
+
+class CountingConnection(DatabaseConnection):
+    """
+    DatabaseConnection that counts calls per query method in ``calls``.
+
+    Filtered-data queries wait for ``release``, which is set by default, so a
+    test can hold them open by clearing it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = Counter()
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_filtered_data(self, *args):
+        self.calls['get_filtered_data'] += 1
+        self.release.wait(5)
+        return super().get_filtered_data(*args)
+
+    def get_customer_scores(self, customer_ids=None):
+        self.calls['get_customer_scores'] += 1
+        return super().get_customer_scores(customer_ids)
+
+    def get_data_version(self):
+        self.calls['get_data_version'] += 1
+        return super().get_data_version()
+
+
+@pytest.fixture
+def orders():
+    """Rows of the db fixture's orders table; override in a module for other data."""
+    return ORDERS
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Returns a factory for connected CountingConnections over new SQLite databases."""
+    def make(orders=ORDERS, name="primary.db", replicas=(), **kwargs):
+        db = CountingConnection(create_orders_db(tmp_path / name, orders), list(replicas), **kwargs)
+        assert db.connect() is not None
+        return db
+
+    return make
+
+
+@pytest.fixture
+def db(make_db, orders):
+    return make_db(orders)
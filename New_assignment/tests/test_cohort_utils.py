@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from src.utils.cohort_utils import build_cohort_matrix, retention_matrix
+
+CUSTOMER_IDS = [1, 1, 2, 2, 3, 1, 4]
+CREATED_AT = [
+    '2024-01-05', '2024-02-01', '2024-02-10', '2024-02-20',
+    '2024-03-01', '2024-04-01', None
+]
+
+
+def test_cohort_matrix_counts_distinct_active_customers():
+    counts = build_cohort_matrix(CUSTOMER_IDS, CREATED_AT)
+
+    assert list(counts.index) == ['2024-01', '2024-02', '2024-03']
+    # Customer 2 ordered twice in February but is counted once
+    np.testing.assert_array_equal(counts.to_numpy(), [
+        [1, 1, 0, 1],
+        [1, 0, 0, 0],
+        [1, 0, 0, 0],
+    ])
+
+
+def test_retention_masks_unreached_months():
+    retention = retention_matrix(build_cohort_matrix(CUSTOMER_IDS, CREATED_AT))
+
+    assert retention.loc['2024-01'].tolist() == [1.0, 1.0, 0.0, 1.0]
+    assert retention.loc['2024-02', 2] == 0.0
+    assert np.isnan(retention.loc['2024-02', 3])
+    assert np.isnan(retention.loc['2024-03', 2])
+
+
+def test_cohort_matrix_matches_groupby():
+    rng = np.random.default_rng(0)
+    customer_ids = rng.integers(0, 500, 5000)
+    created_at = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, 5000), unit='D')
+
+    counts = build_cohort_matrix(customer_ids, created_at)
+
+    activity = pd.DataFrame({
+        'customer_id': customer_ids,
+        'month': pd.Series(created_at).dt.to_period('M')
+    }).drop_duplicates()
+    first = activity.groupby('customer_id')['month'].transform('min')
+    activity['cohort'] = first.astype(str)
+    activity['age'] = (activity['month'] - first).apply(lambda offset: offset.n)
+    expected = activity.groupby(['cohort', 'age']).size().unstack(fill_value=0)
+
+    np.testing.assert_array_equal(counts.to_numpy(), expected.to_numpy())
+    assert list(counts.index) == list(expected.index)
+
+
+def test_empty_input_gives_empty_matrix():
+    assert build_cohort_matrix([], []).empty
+    assert retention_matrix(build_cohort_matrix([], [])).empty
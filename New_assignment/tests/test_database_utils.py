@@ -0,0 +1,145 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src.utils.database_utils import DatabaseConnection
+from src.utils.replica_pool import ReplicaPool
+from tests.conftest import ORDERS, create_orders_db
+
+@pytest.fixture
+def primary_url(tmp_path):
+    return create_orders_db(tmp_path / "primary.db", ORDERS)
+
+
+@pytest.fixture
+def stale_replica_url(tmp_path):
+    # Replica that has not yet replicated the March order
+    return create_orders_db(tmp_path / "replica.db", ORDERS[:3])
+
+
+def connect(primary_url, replica_urls, **kwargs):
+    db = DatabaseConnection(primary_url, replica_urls, **kwargs)
+    assert db.connect() is not None
+    return db
+
+
+def test_filtered_data_without_replicas(primary_url):
+    db = connect(primary_url, [])
+    assert db.replicas is None
+
+    df = db.get_filtered_data('2024-01-01', '2024-12-31', 100, 2)
+
+    assert set(df['customer_id']) == {1}
+    assert len(df) == 2
+
+
+def test_iter_filtered_data_streams_chunks(primary_url):
+    db = connect(primary_url, [])
+
+    chunks = list(db.iter_filtered_data('2024-01-01', '2024-12-31', 0, 1, chunksize=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    streamed = pd.concat(chunks, ignore_index=True)
+    expected = db.get_filtered_data('2024-01-01', '2024-12-31', 0, 1)
+    pd.testing.assert_frame_equal(streamed, expected)
+
+
+def test_order_activity_and_data_version(primary_url):
+    db = connect(primary_url, [])
+
+    activity = db.get_order_activity()
+
+    assert list(activity.columns) == ['customer_id', 'created_at']
+    assert len(activity) == len(ORDERS)
+    assert db.get_data_version() == (4, '2024-03-20 10:00:00')
+
+
+def test_fresh_replica_serves_reads(primary_url, stale_replica_url):
+    db = connect(primary_url, [stale_replica_url])
+    replica = db.replicas.engines[0]
+
+    # The replica has caught up with every order before mid-February
+    assert db._read_engine('2024-02-12') is replica
+    df = db.get_filtered_data('2024-01-01', '2024-02-12', 0, 1)
+    assert set(df['customer_id']) == {1}
+
+
+def test_stale_replica_falls_back_to_primary(primary_url, stale_replica_url):
+    db = connect(primary_url, [stale_replica_url], max_replica_lag=60)
+
+    assert db._read_engine('2024-12-31') is db.engine
+    assert db._read_engine() is db.engine
+    df = db.get_filtered_data('2024-01-01', '2024-12-31', 0, 1)
+    assert 3 in set(df['customer_id'])
+
+    customers, orders, _, _ = db.test_data_exists()
+    assert (customers, orders) == (3, 4)
+
+
+def test_unreachable_replica_is_skipped(primary_url, tmp_path):
+    db = connect(primary_url, [f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"])
+
+    assert db.replicas is None
+    assert db._read_engine() is db.engine
+
+
+def test_round_robin_alternates_replicas(primary_url, tmp_path):
+    replicas = [create_orders_db(tmp_path / f"replica{i}.db", ORDERS) for i in range(2)]
+    db = connect(primary_url, replicas)
+
+    chosen = [db._read_engine() for _ in range(4)]
+
+    assert chosen[0] is chosen[2] and chosen[1] is chosen[3]
+    assert chosen[0] is not chosen[1]
+
+
+def test_least_latency_prefers_fastest_replica():
+    slow, fast = object(), object()
+    pool = ReplicaPool([slow, fast], strategy='least_latency')
+    pool.record_latency(slow, 0.5)
+    pool.record_latency(fast, 0.1)
+
+    assert pool._next_engine() is fast
+
+
+def test_least_latency_reprobes_slow_replica():
+    slow, fast = object(), object()
+    pool = ReplicaPool([slow, fast], strategy='least_latency')
+    pool.PROBE_INTERVAL = 0.05
+    pool.record_latency(slow, 0.5)
+    time.sleep(0.06)
+    pool.record_latency(fast, 0.1)
+
+    # The slow replica has gone a probe interval without a sample
+    assert pool._next_engine() is slow
+    pool.record_latency(slow, 0.01)
+
+    # The probe's sample lowers the slow replica's average
+    assert pool._latencies[id(slow)] < 0.5
+    assert pool._next_engine() is fast
+
+
+def test_least_latency_spreads_reads_over_replicas():
+    engines = [object() for _ in range(4)]
+    pool = ReplicaPool(engines, strategy='least_latency')
+    for engine, seconds in zip(engines, (0.1, 0.2, 0.3, 0.4)):
+        pool.record_latency(engine, seconds)
+
+    chosen = {id(pool._next_engine()) for _ in range(200)}
+
+    # Two random candidates: every replica but the slowest wins some draws
+    assert chosen == {id(engine) for engine in engines[:3]}
+
+
+def test_stale_replica_is_skipped_for_a_fresh_one(primary_url, stale_replica_url, tmp_path):
+    fresh_replica_url = create_orders_db(tmp_path / "fresh.db", ORDERS)
+    db = connect(primary_url, [stale_replica_url, fresh_replica_url], max_replica_lag=60)
+    fresh = db.replicas.engines[1]
+
+    assert all(db._read_engine('2024-12-31') is fresh for _ in range(4))
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ReplicaPool([], strategy='random')
@@ -0,0 +1,86 @@
+import bz2
+import gzip
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.utils.export_utils import EXPORT_COLUMNS, export_file_name, export_filtered_data
+from tests.conftest import ORDERS
+
+CSV_READERS = {None: open, 'gzip': gzip.open, 'bz2': bz2.open}
+
+
+def export(db, path, min_orders=1, **kwargs):
+    return export_filtered_data(db, path, '2024-01-01', '2024-12-31', 0, min_orders,
+                                chunksize=3, **kwargs)
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'bz2'])
+def test_csv_export_streams_every_chunk(db, tmp_path, compression):
+    path = tmp_path / export_file_name('csv', compression)
+
+    rows = export(db, path, compression=compression)
+
+    with CSV_READERS[compression](path, 'rb') as exported:
+        df = pd.read_csv(exported)
+    expected = db.get_filtered_data('2024-01-01', '2024-12-31', 0, 1)
+    assert rows == len(ORDERS)
+    assert list(df.columns) == EXPORT_COLUMNS
+    assert df['display_order_id'].tolist() == expected['display_order_id'].tolist()
+    assert df['total_amount'].sum() == pytest.approx(expected['total_amount'].sum())
+
+
+def test_parquet_export_round_trips(db, tmp_path):
+    path = tmp_path / export_file_name('parquet', 'snappy')
+
+    rows = export(db, path, file_format='parquet', compression='snappy')
+
+    df = pd.read_parquet(path)
+    expected = db.get_filtered_data('2024-01-01', '2024-12-31', 0, 1)
+    assert rows == len(ORDERS)
+    assert list(df.columns) == EXPORT_COLUMNS
+    assert df['display_order_id'].tolist() == expected['display_order_id'].astype(str).tolist()
+    assert df['order_count'].tolist() == expected['order_count'].tolist()
+    assert (pd.to_datetime(df['created_at']) == pd.to_datetime(expected['created_at'])).all()
+
+
+def test_empty_export_keeps_header_and_schema(db, tmp_path):
+    csv_path = tmp_path / "empty.csv"
+    parquet_path = tmp_path / "empty.parquet"
+
+    assert export(db, csv_path, min_orders=10) == 0
+    assert export(db, parquet_path, min_orders=10, file_format='parquet') == 0
+
+    assert list(pd.read_csv(csv_path).columns) == EXPORT_COLUMNS
+    df = pd.read_parquet(parquet_path)
+    assert df.empty and list(df.columns) == EXPORT_COLUMNS
+
+    # Same Parquet schema as an export with rows
+    export(db, tmp_path / "orders.parquet", file_format='parquet')
+    assert pq.read_schema(parquet_path).equals(pq.read_schema(tmp_path / "orders.parquet"))
+
+
+def test_export_to_open_stream_leaves_it_open(db):
+    stream = io.BytesIO()
+
+    export(db, stream)
+
+    assert not stream.closed
+    assert len(pd.read_csv(io.BytesIO(stream.getvalue()))) == len(ORDERS)
+    # Counts are written as integers, not 2.0
+    assert b',2.0,' not in stream.getvalue()
+    assert pd.read_csv(io.BytesIO(stream.getvalue()))['order_count'].dtype == 'int64'
+
+
+def test_unsupported_options_are_rejected(db, tmp_path):
+    with pytest.raises(ValueError):
+        export(db, tmp_path / "orders.xlsx", file_format='xlsx')
+    with pytest.raises(ValueError):
+        export(db, tmp_path / "orders.csv", compression='zstd')
+
+
+def test_export_file_names_are_unique():
+    assert export_file_name('csv', 'gzip') != export_file_name('csv', 'gzip')
+    assert export_file_name('csv', 'gzip').endswith('.csv.gz')
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.filter_cache import FilteredDataCache
+
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(1)
+    seconds = rng.integers(0, 365 * 86400, 400)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(seconds, unit='s')
+    return [
+        (order_id, int(customer_id), str(date), round(float(amount), 2))
+        for order_id, (customer_id, date, amount) in enumerate(
+            zip(rng.integers(1, 40, 400), dates, rng.uniform(5, 300, 400)), start=1
+        )
+    ]
+
+
+def assert_same_result(actual, expected):
+    columns = ['customer_id', 'display_order_id', 'order_count']
+    pd.testing.assert_frame_equal(
+        actual[columns].reset_index(drop=True),
+        expected[columns].reset_index(drop=True),
+        check_dtype=False
+    )
+    np.testing.assert_allclose(actual['total_spent'], expected['total_spent'].astype(float))
+
+
+@pytest.mark.parametrize('narrower', [
+    ('2024-01-01', '2024-12-31', 500, 0),
+    ('2024-01-01', '2024-12-31', 0, 10),
+    ('2024-03-01', '2024-12-31', 0, 0),
+    ('2024-03-15', '2024-06-30', 300, 3),
+    ('2024-05-01', '2024-05-01', 0, 0),
+])
+def test_narrower_filters_match_database(db, narrower):
+    cache = FilteredDataCache(db)
+    cache.get_filtered_data('2024-01-01', '2024-12-31', 0, 0)
+
+    result = cache.get_filtered_data(*narrower)
+
+    assert (cache.hits, cache.misses, db.calls['get_filtered_data']) == (1, 1, 1)
+    assert_same_result(result, db.get_filtered_data(*narrower))
+
+
+def test_widening_filter_goes_to_database(db):
+    cache = FilteredDataCache(db)
+    cache.get_filtered_data('2024-03-01', '2024-06-30', 200, 2)
+
+    cache.get_filtered_data('2024-03-01', '2024-06-30', 100, 2)
+    cache.get_filtered_data('2024-02-01', '2024-06-30', 100, 2)
+    # Now served from the widest result
+    cache.get_filtered_data('2024-03-01', '2024-06-30', 200, 3)
+
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_expired_result_is_refetched(db):
+    cache = FilteredDataCache(db, ttl=0)
+    cache.get_filtered_data('2024-01-01', '2024-12-31', 0, 0)
+    cache.get_filtered_data('2024-01-01', '2024-12-31', 100, 0)
+
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_hits_reuse_scores_and_data_version(db):
+    db.write_customer_scores(pd.DataFrame({
+        'customer_id': range(1, 40),
+        'repeat_probability': np.linspace(0, 1, 39),
+        'model_version': 'v1'
+    }))
+    version = db.get_data_version()
+    cache = FilteredDataCache(db)
+
+    for narrower in [('2024-01-01', '2024-12-31', 0, 0), ('2024-03-01', '2024-06-30', 200, 3)]:
+        df = cache.get_filtered_data(*narrower)
+        scores = cache.get_customer_scores(df['customer_id'].unique())
+        assert sorted(scores['customer_id']) == sorted(df['customer_id'].unique())
+        assert cache.get_data_version() == version
+
+    # One data version lookup above, one for the cached result
+    assert (db.calls['get_filtered_data'], db.calls['get_customer_scores'], db.calls['get_data_version']) == (1, 1, 2)
+
+
+def test_scores_outside_cached_result_go_to_database(db):
+    cache = FilteredDataCache(db)
+    cache.get_filtered_data('2024-03-01', '2024-03-31', 0, 0)
+
+    cache.get_customer_scores([1000])
+    cache.get_customer_scores([1000])
+
+    assert db.calls['get_customer_scores'] == 2
+
+
+def test_refund_outside_narrower_range_goes_to_database(make_db):
+    # Customer 40 is below the threshold only while the refund is in range
+    rows = [
+        (1, 40, '2023-02-10 07:03:47', -3855.0),
+        (2, 40, '2023-02-20 10:00:00', 3339.0),
+        (3, 41, '2023-02-21 10:00:00', 500.0),
+    ]
+    db = make_db(rows, name="refunds.db")
+    cache = FilteredDataCache(db)
+    assert set(cache.get_filtered_data('2023-02-09', '2023-02-28', 0, 0)['customer_id']) == {41}
+
+    result = cache.get_filtered_data('2023-02-11', '2023-02-28', 0, 0)
+
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert_same_result(result, db.get_filtered_data('2023-02-11', '2023-02-28', 0, 0))
+    assert set(result['customer_id']) == {40, 41}
+
+
+def test_null_amounts_are_skipped_like_sql_sum(make_db):
+    rows = [
+        (1, 1, '2024-01-05 10:00:00', None),
+        (2, 1, '2024-01-20 10:00:00', 50.0),
+        (3, 2, '2024-01-25 10:00:00', 20.0),
+    ]
+    db = make_db(rows, name="nulls.db")
+    cache = FilteredDataCache(db)
+    cache.get_filtered_data('2024-01-01', '2024-01-31', 0, 0)
+
+    result = cache.get_filtered_data('2024-01-02', '2024-01-31', 10, 0)
+
+    assert cache.hits == 1
+    assert_same_result(result, db.get_filtered_data('2024-01-02', '2024-01-31', 10, 0))
@@ -0,0 +1,49 @@
+import numpy as np
+
+from src.utils.ml_utils import CustomerPredictor
+from tests.conftest import trained_predictor
+
+
+def test_untrained_predictor_refuses_batches():
+    prediction, message = CustomerPredictor().predict_batch([1], [10.0])
+
+    assert prediction is None
+    assert message == "Model not trained yet"
+
+
+def test_predict_batch_matches_model_predict():
+    predictor = trained_predictor()
+    orders = np.array([1, 2, 3, 5, 8])
+    totals = np.array([10.0, 50.0, 120.0, 400.0, 900.0])
+
+    predictions, probabilities = predictor.predict_batch(orders, totals)
+
+    scaled = predictor.scaler.transform(np.column_stack([orders, totals]))
+    np.testing.assert_array_equal(predictions, predictor.model.predict(scaled))
+    np.testing.assert_allclose(probabilities, predictor.model.predict_proba(scaled))
+
+
+def test_predict_returns_single_customer_result():
+    predictor = trained_predictor()
+
+    prediction, probability = predictor.predict(3, 120.0)
+    predictions, probabilities = predictor.predict_batch([3], [120.0])
+
+    assert prediction == predictions[0]
+    np.testing.assert_allclose(probability, probabilities[0])
+
+
+def test_model_version_is_stable_for_same_data():
+    assert trained_predictor().model_version == trained_predictor().model_version
+    assert CustomerPredictor().model_version is None
+
+
+def test_saved_model_loads_with_same_version(tmp_path):
+    predictor = trained_predictor()
+    predictor.save(tmp_path / "model.joblib")
+
+    loaded = CustomerPredictor.load(tmp_path / "model.joblib")
+
+    assert loaded.is_trained
+    assert loaded.model_version == predictor.model_version
+    np.testing.assert_allclose(loaded.predict(3, 120.0)[1], predictor.predict(3, 120.0)[1])
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.api import query_client
+from src.api.query_client import QueryClient
+from src.api.query_service import QueryService, SingleFlight
+from tests.conftest import ORDERS, trained_predictor
+
+
+@pytest.fixture
+def service(db):
+    service = QueryService(db, max_concurrent_queries=4, max_pending_requests=8)
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    port = server.sockets[0].getsockname()[1]
+    service.url = f"http://127.0.0.1:{port}"
+    yield service
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+def test_single_flight_shares_one_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do('key', work) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(run())
+
+    assert results == ['result'] * 5
+    assert len(calls) == 1
+    assert (flights.calls, flights.coalesced) == (1, 4)
+
+
+@pytest.mark.parametrize('file_format', ['json', 'arrow'])
+def test_client_matches_direct_queries(service, file_format):
+    client = QueryClient(service.url, file_format=file_format)
+    assert client.connect() is client
+
+    df = client.get_filtered_data('2024-01-01', '2024-12-31', 0, 1)
+    expected = service.db_connection.get_filtered_data('2024-01-01', '2024-12-31', 0, 1)
+
+    assert list(df['display_order_id']) == list(expected['display_order_id'])
+    assert client.get_data_version() == service.db_connection.get_data_version()
+    assert client.test_data_exists()[:2] == (3, 4)
+    assert len(client.get_order_activity()) == len(ORDERS)
+    assert client.has_negative_amounts('2024-01-01', '2024-12-31') is False
+
+
+def test_client_fetches_only_requested_scores(service, monkeypatch):
+    service.db_connection.write_customer_scores(pd.DataFrame({
+        'customer_id': [1, 2, 3],
+        'is_repeat_prediction': [1, 0, 1],
+        'repeat_probability': [0.9, 0.2, 0.7],
+        'model_version': 'v1'
+    }))
+    monkeypatch.setattr(query_client, 'IDS_PER_REQUEST', 1)
+    client = QueryClient(service.url)
+
+    scores = client.get_customer_scores([3, 1, 3])
+
+    assert scores['customer_id'].tolist() == [1, 3]
+    assert service._flights.calls == 2
+    assert len(client.get_customer_scores()) == 3
+
+
+def test_predict_serves_the_persisted_model(service, tmp_path):
+    service.model_path = str(tmp_path / "model.joblib")
+    client = QueryClient(service.url)
+
+    prediction, message = client.predict(3, 120.0)
+    assert prediction is None and message.startswith("No model available")
+
+    # Loading is retried once the scoring job has saved a model
+    predictor = trained_predictor()
+    predictor.save(service.model_path)
+    prediction, probability = client.predict(4, 150.0)
+
+    expected, expected_probability = predictor.predict(4, 150.0)
+    assert prediction == expected
+    assert probability == pytest.approx(expected_probability.tolist())
+    assert service.predictor.model_version == predictor.model_version
+
+
+def test_client_streams_filtered_data(service):
+    client = QueryClient(service.url)
+
+    chunks = list(client.iter_filtered_data('2024-01-01', '2024-12-31', 0, 1, chunksize=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    assert pd.concat(chunks)['display_order_id'].tolist() == ['4', '3', '2', '1']
+
+
+def test_stream_close_error_does_not_append_a_response(service, monkeypatch):
+    class FailingClose:
+        def __init__(self, chunks):
+            self.chunks = chunks
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            return next(self.chunks)
+
+        def close(self):
+            raise RuntimeError("cursor already closed")
+
+    iter_filtered_data = service.db_connection.iter_filtered_data
+    monkeypatch.setattr(
+        service.db_connection, 'iter_filtered_data',
+        lambda *args, **kwargs: FailingClose(iter_filtered_data(*args, **kwargs))
+    )
+
+    body = urlopen(f"{service.url}/filtered_data/stream?start_date=2024-01-01"
+                   "&end_date=2024-12-31&min_orders=1&chunksize=3").read()
+
+    assert b'HTTP/1.1' not in body
+    assert len(pa.ipc.open_stream(body).read_all()) == 4
+
+
+def test_concurrent_identical_requests_are_coalesced(service):
+    client = QueryClient(service.url)
+    service.db_connection.release.clear()
+
+    threads = [
+        threading.Thread(target=client.get_filtered_data, args=('2024-01-01', '2024-12-31', 0, 1))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    # Let every request reach the service before the first query finishes
+    while service._flights.coalesced < 5:
+        threading.Event().wait(0.01)
+    service.db_connection.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert service.db_connection.calls['get_filtered_data'] == 1
+
+
+def test_requests_beyond_pending_limit_get_503(service):
+    url = f"{service.url}/filtered_data?start_date=2024-01-01&end_date=2024-12-31"
+    service.db_connection.release.clear()
+
+    threads = [threading.Thread(target=lambda: urlopen(url).read()) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while service._pending < 8:
+        threading.Event().wait(0.01)
+
+    with pytest.raises(HTTPError) as error:
+        urlopen(url)
+    service.db_connection.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert error.value.code == 503
+    assert error.value.headers['Retry-After'] == '1'
+
+
+def test_bad_requests_are_rejected(service):
+    with pytest.raises(HTTPError) as error:
+        urlopen(f"{service.url}/filtered_data?start_date=not-a-date&end_date=2024-01-01")
+    assert error.value.code == 400
+
+    with pytest.raises(HTTPError) as error:
+        urlopen(f"{service.url}/unknown")
+    assert error.value.code == 404
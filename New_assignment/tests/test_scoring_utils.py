@@ -0,0 +1,125 @@
+import shutil
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from src.utils.database_utils import DatabaseConnection
+from src.utils.scoring_utils import load_predictor, score_customers, train_predictor
+from tests.conftest import make_orders
+
+
+@pytest.fixture
+def orders():
+    orders = make_orders()
+    dates = pd.date_range('2024-01-01', periods=len(orders), freq='h')
+    return [
+        (int(order.display_order_id), int(order.customer_id), str(date), order.total_amount)
+        for order, date in zip(orders.itertuples(), dates)
+    ]
+
+
+def test_full_run_scores_every_customer(db):
+    predictor, message = train_predictor(db)
+    assert predictor.is_trained, message
+
+    assert score_customers(db, predictor, chunksize=25) == 80
+
+    scores = db.get_customer_scores()
+    assert len(scores) == 80
+    assert set(scores['model_version']) == {predictor.model_version}
+    expected, _ = predictor.predict_batch(scores['order_count'], scores['total_spent'])
+    assert scores['is_repeat_prediction'].tolist() == expected.tolist()
+
+
+def add_order(db, order_id, customer_id, created_at):
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO orders VALUES ({order_id}, {customer_id}, '{created_at}', 999.0)"
+        ))
+
+
+def test_incremental_run_only_rescores_changed_customers(db, tmp_path):
+    model_path = tmp_path / "model.joblib"
+    predictor, _ = load_predictor(db, model_path)
+    score_customers(db, predictor)
+
+    # A later run loads the persisted model, so new orders keep its version
+    add_order(db, 100000, 7, '2030-01-01 00:00:00')
+    predictor, message = load_predictor(db, model_path)
+    assert message.startswith("Loaded model")
+    assert score_customers(db, predictor) == 1
+    assert score_customers(db, predictor) == 0
+
+    rescored = db.get_customer_scores([7])
+    assert len(rescored) == 1
+    assert rescored['total_spent'].iloc[0] > 999.0
+
+
+def test_retrain_replaces_persisted_model(db, tmp_path):
+    model_path = tmp_path / "model.joblib"
+    predictor, _ = load_predictor(db, model_path)
+    add_order(db, 100000, 7, '2030-01-01 00:00:00')
+
+    retrained, _ = load_predictor(db, model_path, retrain=True)
+
+    assert retrained.model_version != predictor.model_version
+    assert load_predictor(db, model_path)[0].model_version == retrained.model_version
+
+
+def test_orders_arriving_mid_run_are_scored_next_run(db, monkeypatch):
+    predictor, _ = train_predictor(db)
+    write_customer_scores = db.write_customer_scores
+
+    def write_and_receive_orders(scores):
+        if 0 in set(scores['customer_id']):
+            # Customer 0 is already paged, customer 79 is not yet
+            add_order(db, 100000, 79, '2030-01-02 00:00:00')
+            add_order(db, 100001, 0, '2030-01-01 00:00:00')
+        return write_customer_scores(scores)
+
+    monkeypatch.setattr(db, 'write_customer_scores', write_and_receive_orders)
+    score_customers(db, predictor, chunksize=25)
+    monkeypatch.undo()
+
+    assert score_customers(db, predictor) == 2
+    assert db.get_customer_scores([0])['order_count'].iloc[0] > 1
+
+
+def test_interrupted_run_is_redone(db, monkeypatch):
+    predictor, _ = train_predictor(db)
+    score_customers(db, predictor)
+    add_order(db, 100000, 7, '2030-01-01 00:00:00')
+    add_order(db, 100001, 70, '2030-01-01 00:00:00')
+
+    def fail_after_first_chunk(scores):
+        if 70 in set(scores['customer_id']):
+            raise RuntimeError("connection lost")
+        return write_customer_scores(scores)
+
+    write_customer_scores = db.write_customer_scores
+    monkeypatch.setattr(db, 'write_customer_scores', fail_after_first_chunk)
+    with pytest.raises(RuntimeError):
+        score_customers(db, predictor, chunksize=25)
+    monkeypatch.undo()
+
+    assert score_customers(db, predictor) == 2
+
+
+def test_scores_lookup_without_table_is_empty(db):
+    assert db.get_customer_scores([1, 2]).empty
+
+
+def test_lagging_replica_does_not_hide_new_orders(db, tmp_path):
+    predictor, _ = train_predictor(db)
+    score_customers(db, predictor)
+    # The replica has not seen the new order yet but is within the allowed lag
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    shutil.copy(tmp_path / "primary.db", tmp_path / "replica.db")
+    add_order(db, 100000, 7, '2030-01-01 00:00:00')
+    lagging = DatabaseConnection(db.connection_string, [replica_url], max_replica_lag=10 ** 9)
+    lagging.connect()
+    assert lagging.replicas is not None
+
+    assert score_customers(lagging, predictor) == 1
+    assert db.get_customer_scores([7])['total_spent'].iloc[0] > 999.0